@@ -0,0 +1,280 @@
+"""Scaling benchmarks for the regex -> NFA -> DFA -> minimize pipeline.
+
+Each benchmark family builds a parameterized input of size n and times every
+stage of the pipeline on it, recording the wall time (best of several runs)
+and the peak memory allocated during the stage (measured in a separate run
+with tracemalloc, so that tracing does not distort the timings).
+
+Run the suite and write the results to a JSON file:
+
+    python benchmarks/bench_pipeline.py --output results.json
+
+Compare the results of two runs (e.g. from two commits):
+
+    python benchmarks/bench_pipeline.py --compare old.json new.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from reglib.regex import Regex
+from reglib.dfa import Dfa
+from reglib.language import Language
+
+
+def blowup_regex(n):
+    # (a|b)*a(a|b){n}, whose minimal DFA has 2^(n + 1) states
+    return "(a|b)*a" + "(a|b)" * n
+
+
+def concat_regex(n):
+    return "".join("ab"[i % 2] for i in range(n))
+
+
+def nesting_regex(n):
+    regex = "a"
+    for i in range(n):
+        regex = f"({regex}|{'ab'[i % 2]})*{'ba'[i % 2]}"
+    return regex
+
+
+def large_alphabet_regex(n):
+    symbols = [chr(0x4e00 + i) for i in range(n)]
+    return "(" + "|".join(symbols) + ")*" + symbols[0] + symbols[-1]
+
+
+def random_dfa(n, seed=0, alphabet="ab"):
+    rng = random.Random(seed)
+    dfa = Dfa()
+    dfa.get_new_states(n)
+    dfa.set_initial_state(0)
+    dfa.set_accepting_states(*[p for p in range(n) if rng.random() < 0.5])
+    for p in range(n):
+        for symbol in alphabet:
+            dfa.set_transition(p, symbol, rng.randrange(n))
+    return dfa
+
+
+def random_words(n, seed=0, alphabet="abcdefgh"):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 12)))
+        for _ in range(n)
+    ]
+
+
+def reminimize_stages():
+    # Minimizes the minimal DFA of n random words again after accepting one
+    # more state, either incrementally or from scratch
+    def edited_dfa(n):
+        dfa = Dfa.from_words(random_words(n))
+        dfa.set_accepting_states(dfa.get_num_states() // 2)
+        return dfa
+
+    def edited_dfa_from_scratch(n):
+        dfa = edited_dfa(n)
+        dfa._dirty_states = None
+        return dfa
+
+    return {
+        "incremental": (edited_dfa, lambda dfa: dfa.minimize()),
+        "from_scratch": (edited_dfa_from_scratch, lambda dfa: dfa.minimize()),
+    }
+
+
+def processes_stages(process_counts=(2, 4)):
+    # Determinizes the NFA of blowup_regex(n) serially and with pools of
+    # worker processes; the pools are reused, so only the first run of each
+    # stage pays for starting them
+    def finalized_nfa(n):
+        nfa = Regex(blowup_regex(n)).to_nfa()
+        nfa._finalize()
+        return nfa
+
+    stages = {"serial": (finalized_nfa, Dfa.from_nfa)}
+    for processes in process_counts:
+        stages[f"processes_{processes}"] = (
+            finalized_nfa,
+            lambda nfa, processes=processes: Dfa.from_nfa(
+                nfa, processes=processes
+            )
+        )
+    return stages
+
+
+def regex_stages(make_regex):
+    # Returns the stages of the pipeline for a regex family; each stage is a
+    # pair of a setup function, which builds the input of the stage from
+    # scratch, and the function being measured
+    def parse(n):
+        return make_regex(n)
+
+    def to_nfa(n):
+        return Regex(make_regex(n))
+
+    def from_nfa(n):
+        return Regex(make_regex(n)).to_nfa()
+
+    def minimize(n):
+        return Dfa.from_nfa(Regex(make_regex(n)).to_nfa())
+
+    stages = language_stages({
+        "parse": (parse, Regex),
+        "to_nfa": (to_nfa, lambda regex: regex.to_nfa()),
+        "from_nfa": (from_nfa, Dfa.from_nfa),
+        "minimize": (minimize, lambda dfa: dfa.minimize()),
+    }, lambda n: Language.from_regex(Regex(make_regex(n))))
+    # The languages of these families have short regular expressions, so
+    # the string converted back is rendered too (random DFAs have none)
+    stages["to_regex_string"] = (
+        stages["to_regex"][0], lambda lang: str(lang.to_regex())
+    )
+    return stages
+
+
+def random_dfa_stages():
+    return language_stages({
+        "minimize": (random_dfa, lambda dfa: dfa.minimize()),
+    }, lambda n: Language.from_nfa(random_dfa(n)))
+
+
+def language_stages(stages, make_language):
+    def finalized_language(n):
+        lang = make_language(n)
+        lang._finalize()
+        return lang
+
+    def query_string(n):
+        lang = finalized_language(n)
+        alphabet = sorted(lang._dfa.get_alphabet())
+        rng = random.Random(n)
+        return lang, "".join(rng.choice(alphabet) for _ in range(10000))
+
+    stages = dict(stages)
+    stages["contains_example"] = (
+        finalized_language, lambda lang: lang.contains()
+    )
+    stages["contains_string"] = (
+        query_string, lambda lang_x: lang_x[0].contains(lang_x[1])
+    )
+    stages["is_full"] = (finalized_language, lambda lang: lang.is_full())
+    stages["to_regex"] = (finalized_language, lambda lang: lang.to_regex())
+    return stages
+
+
+FAMILIES = {
+    "blowup": (regex_stages(blowup_regex), [2, 4, 6, 8]),
+    "concat": (regex_stages(concat_regex), [25, 50, 100]),
+    "nesting": (regex_stages(nesting_regex), [2, 4, 8, 16]),
+    "large_alphabet": (regex_stages(large_alphabet_regex), [8, 32, 64]),
+    "random_dfa": (random_dfa_stages(), [25, 50, 100, 200]),
+    "reminimize": (reminimize_stages(), [1000, 4000, 16000]),
+    "processes": (processes_stages(), [10, 13, 15]),
+}
+
+
+def measure(setup, run, n, repeat):
+    best_seconds = None
+    for _ in range(repeat):
+        x = setup(n)
+        start = time.perf_counter()
+        run(x)
+        seconds = time.perf_counter() - start
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+
+    x = setup(n)
+    tracemalloc.start()
+    run(x)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_seconds, peak_bytes
+
+
+def run_benchmarks(families, repeat):
+    results = []
+    for family in families:
+        stages, sizes = FAMILIES[family]
+        for n in sizes:
+            for stage, (setup, run) in stages.items():
+                seconds, peak_bytes = measure(setup, run, n, repeat)
+                results.append({
+                    "family": family,
+                    "n": n,
+                    "stage": stage,
+                    "seconds": seconds,
+                    "peak_bytes": peak_bytes,
+                })
+                print(
+                    f"{family:>14} n={n:<5} {stage:<16} "
+                    f"{seconds * 1000:10.3f} ms {peak_bytes / 1024:10.1f} KiB",
+                    file=sys.stderr
+                )
+    return results
+
+
+def compare(old_filename, new_filename):
+    with open(old_filename) as f:
+        old_results = json.load(f)["results"]
+    with open(new_filename) as f:
+        new_results = json.load(f)["results"]
+
+    def key(result):
+        return result["family"], result["n"], result["stage"]
+
+    old_results = {key(result): result for result in old_results}
+    for result in new_results:
+        old_result = old_results.get(key(result))
+        if old_result is None:
+            continue
+        family, n, stage = key(result)
+        time_ratio = result["seconds"] / max(old_result["seconds"], 1e-9)
+        memory_ratio = (
+            result["peak_bytes"] / max(old_result["peak_bytes"], 1)
+        )
+        print(
+            f"{family:>14} n={n:<5} {stage:<16} "
+            f"time x{time_ratio:6.2f}  memory x{memory_ratio:6.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--family", action="append", choices=sorted(FAMILIES),
+        help="benchmark family to run (default: all)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="number of timed runs per stage, the best is reported"
+    )
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("OLD", "NEW"),
+        help="compare two result files instead of running the benchmarks"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_benchmarks(args.family or list(FAMILIES), args.repeat)
+    output = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Number of bits of the state set looked up in each follow table
+_CHUNK_BITS = 8
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+class BitParallelMatcher:
+    # Simulates an ε-free NFA in which all transitions into a state are on
+    # the same symbol (e.g. a Glushkov automaton), keeping the set of active
+    # states as the bits of an integer. State 0 is the initial state, and
+    # follow[p] is the bitmask of the states reachable from state p. Since
+    # the symbol only depends on the target state, one step of the
+    # simulation is (union of follow[p] for active p) & symbol_masks[symbol],
+    # where the union is looked up _CHUNK_BITS states at a time
+    def __init__(self, follow, symbol_masks, accepting_mask):
+        self._symbol_masks = dict(symbol_masks)
+        self._accepting_mask = accepting_mask
+
+        self._follow_tables = []
+        for chunk_start in range(0, len(follow), _CHUNK_BITS):
+            chunk_follow = follow[chunk_start:chunk_start + _CHUNK_BITS]
+            table = [0] * (1 << len(chunk_follow))
+            for bits in range(1, len(table)):
+                lowest_bit = bits & -bits
+                table[bits] = (
+                    table[bits ^ lowest_bit] |
+                    chunk_follow[lowest_bit.bit_length() - 1]
+                )
+            self._follow_tables.append(table)
+
+    def __call__(self, string):
+        symbol_masks = self._symbol_masks
+        follow_tables = self._follow_tables
+        states = 1
+        for symbol in string:
+            symbol_mask = symbol_masks.get(symbol)
+            if symbol_mask is None:
+                return False
+            next_states = 0
+            for table in follow_tables:
+                if states & _CHUNK_MASK:
+                    next_states |= table[states & _CHUNK_MASK]
+                states >>= _CHUNK_BITS
+                if not states:
+                    break
+            states = next_states & symbol_mask
+            if not states:
+                return False
+        return bool(states & self._accepting_mask)
@@ -0,0 +1,123 @@
+import contextvars
+import time
+
+# Budgets of the currently active `with` blocks of this thread (or task);
+# when there are none, the checks inside the construction loops are skipped
+# entirely
+_budgets = contextvars.ContextVar("budgets", default=())
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason, phase, states=None, transitions=None,
+                 seconds=None, budget=None):
+        counts = []
+        if states is not None:
+            counts.append(f"{states} states")
+        if transitions is not None:
+            counts.append(f"{transitions} transitions")
+        message = f"{phase} exceeded its budget ({reason})"
+        if counts:
+            message += " with " + " and ".join(counts)
+        super().__init__(message)
+        self.reason = reason
+        self.phase = phase
+        self.states = states
+        self.transitions = transitions
+        self.seconds = seconds
+        # The Budget whose limit was exceeded
+        self.budget = budget
+
+    def as_dict(self):
+        return {
+            "reason": self.reason,
+            "phase": self.phase,
+            "states": self.states,
+            "transitions": self.transitions,
+            "seconds": self.seconds,
+        }
+
+
+class Cancelled(BudgetExceeded):
+    pass
+
+
+class CancellationToken:
+    def __init__(self):
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+
+class Budget:
+    # Limits the determinization, minimization and product constructions run
+    # inside a `with` block: the number of states and transitions each of
+    # them creates, the time until the deadline (timeout seconds after
+    # entering the block), and cooperative cancellation through a token
+    def __init__(self, max_states=None, max_transitions=None, timeout=None,
+                 token=None):
+        self.max_states = max_states
+        self.max_transitions = max_transitions
+        self.timeout = timeout
+        self.token = token
+        self._deadline = None
+
+    def __enter__(self):
+        if self.timeout is not None:
+            self._deadline = time.monotonic() + self.timeout
+        _budgets.set(_budgets.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        budgets = list(_budgets.get())
+        budgets.remove(self)
+        _budgets.set(tuple(budgets))
+        return False
+
+    def _get_exceeded_reason(self, states, transitions):
+        if self.token is not None and self.token.is_cancelled():
+            return "cancelled"
+        if (
+            self.max_states is not None and states is not None and
+            states > self.max_states
+        ):
+            return "max_states"
+        if (
+            self.max_transitions is not None and transitions is not None and
+            transitions > self.max_transitions
+        ):
+            return "max_transitions"
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            return "deadline"
+        return None
+
+
+class PhaseBudget:
+    def __init__(self, phase, budgets):
+        self.phase = phase
+        self.budgets = budgets
+        self._start = time.monotonic()
+
+    def check(self, states=None, transitions=None):
+        for budget in self.budgets:
+            reason = budget._get_exceeded_reason(states, transitions)
+            if reason is not None:
+                exception_class = (
+                    Cancelled if reason == "cancelled" else BudgetExceeded
+                )
+                raise exception_class(
+                    reason, self.phase, states=states,
+                    transitions=transitions,
+                    seconds=time.monotonic() - self._start, budget=budget
+                )
+
+
+def start_phase(phase):
+    # Returns a PhaseBudget whose check method is to be called inside the
+    # loops of the phase, or None if no budgets are active
+    budgets = _budgets.get()
+    if not budgets:
+        return None
+    return PhaseBudget(phase, budgets)
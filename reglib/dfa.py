@@ -1,37 +1,197 @@
 from reglib.nfa import Nfa, EPS
 from reglib.regex import Regex
+from reglib import regex as _regex
+from reglib import stats
+from reglib import budget
+from collections import deque
+import atexit
+import itertools
+import multiprocessing
+import pickle
+
+class _Accept:
+    pass
+
+class _Reject:
+    pass
+
+# Frontiers smaller than this are expanded by the coordinator itself, since
+# sending them to the worker processes would cost more than expanding them
+_MIN_POOL_FRONTIER = 64
+
+def _get_successor_masks(nfa, alphabet):
+    # Returns, for each NFA state, a dict mapping the index of each symbol in
+    # the alphabet to the bitmask of the ε-closure of the states reached on
+    # that symbol
+    symbol_indices = {symbol: i for i, symbol in enumerate(alphabet)}
+    closure_masks = [
+        sum(1 << q for q in nfa._eps_closure[p]) for p in nfa.get_states()
+    ]
+    successor_masks = []
+    for from_state in nfa.get_states():
+        successors = dict()
+        transitions_from_state = nfa._transitions.get(from_state, {})
+        for symbol, to_states in transitions_from_state.items():
+            if symbol is EPS:
+                continue
+            mask = 0
+            for to_state in to_states:
+                mask |= closure_masks[to_state]
+            successors[symbol_indices[symbol]] = mask
+        successor_masks.append(successors)
+    return successor_masks
+
+def _expand_subsets(subsets, successor_masks, num_symbols):
+    # Expands the given subsets (bitmasks of NFA states), and returns the
+    # distinct successor subsets together with, for each subset, the indices
+    # of its successors on each symbol among them, so that every successor
+    # is only sent back once per chunk
+    distinct_successors = dict()
+    rows = []
+    for subset in subsets:
+        successors = [0] * num_symbols
+        while subset:
+            lowest_bit = subset & -subset
+            for i, mask in successor_masks[lowest_bit.bit_length() - 1].items():
+                successors[i] |= mask
+            subset ^= lowest_bit
+        rows.append(tuple(
+            distinct_successors.setdefault(successor, len(distinct_successors))
+            for successor in successors
+        ))
+    return list(distinct_successors), rows
+
+# Worker processes keep the successor masks of the last determinization they
+# worked on, so that they are only unpickled once per call of from_nfa
+_worker_key = None
+_worker_successor_masks = None
+
+def _expand_chunk(task):
+    global _worker_key, _worker_successor_masks
+    key, pickled_successor_masks, num_symbols, subsets = task
+    if key != _worker_key:
+        _worker_successor_masks = pickle.loads(pickled_successor_masks)
+        _worker_key = key
+    return _expand_subsets(subsets, _worker_successor_masks, num_symbols)
+
+# Distinguishes the determinizations sent to the worker processes
+_task_keys = itertools.count()
+
+# Pools of worker processes by their size, reused across determinizations
+_pools = dict()
+
+def _get_pool(processes):
+    if processes not in _pools:
+        _pools[processes] = multiprocessing.Pool(processes)
+    return _pools[processes]
+
+@atexit.register
+def _close_pools():
+    for pool in _pools.values():
+        pool.terminate()
+    _pools.clear()
 
 class Dfa(Nfa):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._minimized = False
+        # States edited since the last minimization, which left every state
+        # inequivalent to every other one; None if that is unknown
+        self._dirty_states = None
+
+        self._symbol_class = None
+        self._class_symbols = None
+        self._class_table = None
 
     def get_new_state(self, *args, **kwargs):
         self._minimized = False
-        return super().get_new_state(*args, **kwargs)
+        state = super().get_new_state(*args, **kwargs)
+        self._mark_dirty(state)
+        return state
 
     def get_new_states(self, *args, **kwargs):
         self._minimized = False
-        return super().get_new_states(*args, **kwargs)
+        states = super().get_new_states(*args, **kwargs)
+        self._mark_dirty(*states)
+        return states
 
     def set_initial_state(self, *args, **kwargs):
         self._minimized = False
         return super().set_initial_state(*args, **kwargs)
 
-    def set_accepting_states(self, *args, **kwargs):
+    def set_accepting_states(self, *accepting_states):
         self._minimized = False
-        return super().set_accepting_states(*args, **kwargs)
+        self._mark_dirty(*accepting_states)
+        return super().set_accepting_states(*accepting_states)
 
     def set_transition(self, from_state, symbol, to_state):
+        # Replaces the previous transition on the symbol, if any
         assert symbol != EPS
+        self._transitions.get(from_state, {}).pop(symbol, None)
         super().set_transition(from_state, symbol, to_state)
         self._minimized = False
+        self._mark_dirty(from_state)
+
+    def _mark_dirty(self, *states):
+        if self._dirty_states is not None:
+            self._dirty_states.update(states)
 
     def get_transition(self, from_state, symbol):
         to_states = self.get_transitions(from_state, symbol)
         to_state, = to_states
         return to_state
-        
+
+    def _finalize(self):
+        if not self._finalized:
+            super()._finalize()
+            phase_stats = stats.start_phase("symbol_classes")
+
+            # Group symbols that lead every state to the same state into
+            # equivalence classes, and store the transition table over the
+            # class IDs instead of the individual symbols
+            states = self.get_states()
+            signature_to_class = dict()
+            self._symbol_class = dict()
+            self._class_symbols = []
+            for symbol in self._alphabet:
+                signature = tuple(
+                    self._get_single_transition(p, symbol) for p in states
+                )
+                if signature not in signature_to_class:
+                    signature_to_class[signature] = len(self._class_symbols)
+                    self._class_symbols.append([])
+                c = signature_to_class[signature]
+                self._symbol_class[symbol] = c
+                self._class_symbols[c].append(symbol)
+
+            num_classes = len(self._class_symbols)
+            self._class_table = [[None] * num_classes for _ in states]
+            for signature, c in signature_to_class.items():
+                for p, q in zip(states, signature):
+                    self._class_table[p][c] = q
+            self._class_table = [tuple(row) for row in self._class_table]
+
+            if phase_stats is not None:
+                phase_stats.finish(
+                    states=len(states),
+                    transitions=sum(
+                        len(self._class_symbols[c])
+                        for row in self._class_table
+                        for c, q in enumerate(row) if q is not None
+                    )
+                )
+
+    def _get_single_transition(self, from_state, symbol):
+        to_states = self.get_transitions(from_state, symbol)
+        if len(to_states) != 1:
+            return None
+        to_state, = to_states
+        return to_state
+
+    def get_symbol_classes(self):
+        self._finalize()
+        return [set(symbols) for symbols in self._class_symbols]
+
     def _validate(self):
         super._validate()
         assert len(self._transitions) == self.num_states
@@ -43,128 +203,598 @@ class Dfa(Nfa):
 
     def _add_transitions_from(self, *args, **kwargs):
         self._minimized = False
+        self._dirty_states = None
         return super()._add_transitions_from(*args, **kwargs)
 
     @staticmethod
-    def from_nfa(nfa):
+    def from_nfa(nfa, processes=None):
+        # Determinizes the NFA with the subset construction, expanding one
+        # breadth-first frontier of subsets (kept as bitmasks of NFA states)
+        # at a time. If processes is greater than 1, large frontiers are
+        # expanded by a (reused) pool of that many worker processes, and the
+        # resulting DFA is the same up to the numbering of the states
         nfa._finalize()
-        dfa_initial_state = frozenset(nfa._eps_closure[nfa._initial_state])
-        unprocessed_dfa_states = {dfa_initial_state}
-        dfa_states = dict()
-        dfa_transitions = list()
-        while unprocessed_dfa_states:
-            dfa_state = unprocessed_dfa_states.pop()
-            dfa_states[dfa_state] = len(dfa_states)
-            for symbol in nfa._alphabet:
-                new_dfa_state = set()
-                for from_state in dfa_state:
-                    if from_state not in nfa._transitions:
-                        continue
-                    transitions_from_state = nfa._transitions[from_state]
-                    if symbol not in transitions_from_state:
-                        continue
-                    to_states = transitions_from_state[symbol]
-                    for to_state in to_states:
-                        new_dfa_state = new_dfa_state.union(
-                            nfa._eps_closure[to_state]
-                        )
-                new_dfa_state = frozenset(new_dfa_state)
-                if (
-                    new_dfa_state not in unprocessed_dfa_states and
-                    new_dfa_state not in dfa_states
-                ):
-                    unprocessed_dfa_states.add(new_dfa_state)
-                dfa_transitions.append((dfa_state, symbol, new_dfa_state))
+        phase_stats = stats.start_phase("subset_construction")
+        phase_budget = budget.start_phase("subset_construction")
+        alphabet = list(nfa._alphabet)
+        num_symbols = len(alphabet)
+        successor_masks = _get_successor_masks(nfa, alphabet)
+        dfa_initial_state = sum(
+            1 << q for q in nfa._eps_closure[nfa._initial_state]
+        )
+        dfa_states = {dfa_initial_state: 0}
+        dfa_transitions = []
+        frontier = [dfa_initial_state]
+
+        pool = None
+        if processes is not None and processes > 1:
+            pool = _get_pool(processes)
+            task_key = next(_task_keys)
+            pickled_successor_masks = pickle.dumps(successor_masks)
+        while frontier:
+            if phase_budget is not None:
+                phase_budget.check(
+                    states=len(dfa_states),
+                    transitions=len(dfa_transitions) * num_symbols
+                )
+            if pool is not None and len(frontier) >= _MIN_POOL_FRONTIER:
+                chunk_size = -(-len(frontier) // (4 * processes))
+                expanded_chunks = pool.map(_expand_chunk, [
+                    (
+                        task_key, pickled_successor_masks, num_symbols,
+                        frontier[i:i + chunk_size]
+                    )
+                    for i in range(0, len(frontier), chunk_size)
+                ])
+            else:
+                expanded_chunks = [
+                    _expand_subsets(frontier, successor_masks, num_symbols)
+                ]
+
+            new_frontier = []
+            for successors, rows in expanded_chunks:
+                successor_nums = []
+                for successor in successors:
+                    if successor not in dfa_states:
+                        dfa_states[successor] = len(dfa_states)
+                        new_frontier.append(successor)
+                        if phase_budget is not None:
+                            phase_budget.check(
+                                states=len(dfa_states),
+                                transitions=len(dfa_transitions) * num_symbols
+                            )
+                    successor_nums.append(dfa_states[successor])
+                for row in rows:
+                    dfa_transitions.append([successor_nums[i] for i in row])
+            frontier = new_frontier
 
+        # The rows of the transitions are in the order the states were
+        # numbered, since frontiers are expanded in that order
+        accepting_mask = sum(1 << q for q in nfa._accepting_states)
         dfa = Dfa()
         dfa.get_new_states(len(dfa_states))
         dfa.set_initial_state(0)
-        for dfa_state, dfa_state_num in dfa_states.items():
-            if dfa_state.intersection(nfa._accepting_states):
-                dfa.set_accepting_states(dfa_state_num)
-        for from_dfa_state, symbol, to_dfa_state in dfa_transitions:
-            from_dfa_state_num = dfa_states[from_dfa_state]
-            to_dfa_state_num = dfa_states[to_dfa_state]
-            dfa.set_transition(from_dfa_state_num, symbol, to_dfa_state_num)
+        dfa.set_accepting_states(*[
+            dfa_state_num for dfa_state, dfa_state_num in dfa_states.items()
+            if dfa_state & accepting_mask
+        ])
+        dfa._transitions = {
+            from_dfa_state_num: {
+                symbol: {to_dfa_state_num}
+                for symbol, to_dfa_state_num in zip(alphabet, row)
+            }
+            for from_dfa_state_num, row in enumerate(dfa_transitions)
+        }
+
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=len(dfa_states),
+                transitions=len(dfa_transitions) * num_symbols,
+                peak_subset_size=max(
+                    bin(dfa_state).count("1") for dfa_state in dfa_states
+                ),
+                iterations=len(dfa_states)
+            )
         return dfa
 
     @staticmethod
-    def from_regex(regex):
-        return Dfa.from_nfa(regex.to_nfa())
+    def from_regex(regex, processes=None):
+        return Dfa.from_nfa(regex.to_nfa(), processes=processes)
+
+    @staticmethod
+    def from_words(words):
+        # Builds the minimal DFA accepting exactly the given words with
+        # Daciuk et al.'s incremental register algorithm, which keeps the
+        # automaton minimal after every insertion, so the words do not
+        # have to be sorted
+        phase_stats = stats.start_phase("from_words")
+        num_words = 0
+        transitions = [dict()]
+        final = [False]
+        indegree = [0]
+        free_states = []
+        register = dict()
+
+        def new_state():
+            if free_states:
+                p = free_states.pop()
+                transitions[p] = dict()
+                final[p] = False
+                indegree[p] = 0
+            else:
+                p = len(transitions)
+                transitions.append(dict())
+                final.append(False)
+                indegree.append(0)
+            return p
+
+        def key(p):
+            return final[p], frozenset(transitions[p].items())
+
+        def link(p, symbol, q):
+            old_q = transitions[p].get(symbol)
+            if old_q is not None:
+                indegree[old_q] -= 1
+            transitions[p][symbol] = q
+            indegree[q] += 1
+
+        def clone(p):
+            q = new_state()
+            final[q] = final[p]
+            for symbol, to_state in transitions[p].items():
+                link(q, symbol, to_state)
+            return q
+
+        for word in words:
+            num_words += 1
+            # Follow the longest prefix of the word already in the automaton
+            path = [0]
+            for symbol in word:
+                q = transitions[path[-1]].get(symbol)
+                if q is None:
+                    break
+                path.append(q)
+            if len(path) == len(word) + 1 and final[path[-1]]:
+                continue
+
+            # States on the path will change, so they leave the register;
+            # states shared with other words (i.e. from the first confluence
+            # state onwards) are cloned instead of changed in place
+            first_confluence = len(path)
+            for i in range(1, len(path)):
+                if indegree[path[i]] > 1:
+                    first_confluence = i
+                    break
+            for p in path[1:first_confluence]:
+                if register.get(key(p)) == p:
+                    del register[key(p)]
+            if first_confluence < len(path):
+                clones = [clone(p) for p in path[first_confluence:]]
+                for i in range(first_confluence, len(path)):
+                    path[i] = clones[i - first_confluence]
+                    link(path[i - 1], word[i - 1], path[i])
+
+            for symbol in word[len(path) - 1:]:
+                q = new_state()
+                link(path[-1], symbol, q)
+                path.append(q)
+            final[path[-1]] = True
+
+            # Replace each changed state on the path with an equivalent
+            # registered state, or register it, from the deepest one up
+            for i in range(len(path) - 1, 0, -1):
+                p = path[i]
+                equivalent_state = register.get(key(p))
+                if equivalent_state is None:
+                    register[key(p)] = p
+                elif equivalent_state != p:
+                    link(path[i - 1], word[i - 1], equivalent_state)
+                    for to_state in transitions[p].values():
+                        indegree[to_state] -= 1
+                    free_states.append(p)
+
+        # Renumber the reachable states, adding a rejecting sink state for
+        # the missing transitions
+        alphabet = set()
+        state_nums = {0: 0}
+        stack = [0]
+        while stack:
+            p = stack.pop()
+            for symbol, q in transitions[p].items():
+                alphabet.add(symbol)
+                if q not in state_nums:
+                    state_nums[q] = len(state_nums)
+                    stack.append(q)
+
+        dfa = Dfa()
+        dfa.get_new_states(len(state_nums))
+        dfa.set_initial_state(0)
+        dfa.set_accepting_states(*[
+            state_nums[p] for p in state_nums if final[p]
+        ])
+        sink_state = None
+        for p, p_num in state_nums.items():
+            for symbol in alphabet:
+                q = transitions[p].get(symbol)
+                if q is None:
+                    if sink_state is None:
+                        sink_state = dfa.get_new_state()
+                        for sink_symbol in alphabet:
+                            dfa.set_transition(
+                                sink_state, sink_symbol, sink_state
+                            )
+                    dfa.set_transition(p_num, symbol, sink_state)
+                else:
+                    dfa.set_transition(p_num, symbol, state_nums[q])
+        dfa._minimized = True
+        dfa._dirty_states = set()
+
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=dfa.get_num_states(),
+                transitions=dfa.get_num_states() * len(alphabet),
+                iterations=num_words
+            )
+        return dfa
 
     def minimize(self):
         if self._minimized:
             return
 
         self._finalize()
+        phase_stats = stats.start_phase("minimize")
+        phase_budget = budget.start_phase("minimize")
+        partition = None
+        if self._dirty_states is not None:
+            partition = self._get_incremental_partition(phase_budget)
+        if partition is None:
+            partition = self._get_partition(phase_budget)
+        block, num_iterations = partition
 
-        dist = [[False] * (i + 1) for i in range(self._num_states)]
-        for i in range(self._num_states):
-            for j in range(i):
-                dist[i][j] = (
-                    (i in self._accepting_states) !=
-                    (j in self._accepting_states)
-                )
-        changed = True
-        while changed:
-            changed = False
-            for i in range(self._num_states):
-                for j in range(i):
-                    if dist[i][j]:
-                        continue
-                    for symbol in self._alphabet:
-                        i2 = self.get_transition(i, symbol)
-                        j2 = self.get_transition(j, symbol)
-                        if dist[max(i2, j2)][min(i2, j2)]:
-                            dist[i][j] = True
-                            changed = True
-                            break
-
-        partition = list(range(self._num_states))
-        def get_partition(p):
-            if partition[p] == p:
-                return p
-            partition[p] = get_partition(partition[p])
-            return partition[p]
-
-        for i in range(self._num_states):
-            for j in range(i):
-                if not dist[i][j]:
-                    partition[i] = get_partition(j)
-
-        stack = [get_partition(self._initial_state)]
-        processed = [False] * self._num_states
-        processed[stack[0]] = True
+        # Rebuild the DFA with one state per block reachable from the
+        # initial state, unless every state is reachable and in its own block
+        table = self._class_table
+        initial_block = block[self._initial_state]
+        block_to_state = {initial_block: 0}
+        representatives = [self._initial_state]
         transitions = []
-        partition_to_state = dict()
+        for p in representatives:
+            for c, q in enumerate(table[p]):
+                if q is None:
+                    continue
+                if block[q] not in block_to_state:
+                    block_to_state[block[q]] = len(block_to_state)
+                    representatives.append(q)
+                transitions.append((
+                    block_to_state[block[p]], c, block_to_state[block[q]]
+                ))
+
+        if len(representatives) < len(table) or len(set(block)) < len(table):
+            new_accepting_states = {
+                block_to_state[block[p]] for p in representatives
+                if p in self._accepting_states
+            }
+            class_symbols = self._class_symbols
+            new_transitions = dict()
+            for p, c, q in transitions:
+                transitions_from_state = new_transitions.setdefault(p, dict())
+                for symbol in class_symbols[c]:
+                    transitions_from_state[symbol] = {q}
+            self._num_states = len(representatives)
+            self._transitions = new_transitions
+            self._initial_state = 0
+            self._accepting_states = new_accepting_states
+            self._finalized = False
+
+        self._minimized = True
+        self._dirty_states = set()
+
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=self._num_states,
+                transitions=sum(
+                    len(self._class_symbols[c]) for _, c, _ in transitions
+                ),
+                iterations=num_iterations
+            )
+
+    def _get_partition(self, phase_budget):
+        # Moore's algorithm: starting from accepting and rejecting states,
+        # repeatedly splits the blocks by the blocks of the successors until
+        # no block is split. Returns the block of each state and the number
+        # of rounds
+        table = self._class_table
+        block = [
+            1 if p in self._accepting_states else 0 for p in self.get_states()
+        ]
+        num_blocks = len(set(block))
+        num_iterations = 0
+        while True:
+            num_iterations += 1
+            if phase_budget is not None:
+                phase_budget.check(states=num_blocks)
+            signatures = dict()
+            new_block = [
+                signatures.setdefault(
+                    (
+                        block[p],
+                        tuple(None if q is None else block[q] for q in row)
+                    ),
+                    len(signatures)
+                )
+                for p, row in enumerate(table)
+            ]
+            block = new_block
+            if len(signatures) == num_blocks:
+                return block, num_iterations
+            num_blocks = len(signatures)
+
+    def _get_incremental_partition(self, phase_budget):
+        # After the last minimization, every state was inequivalent to every
+        # other one, and only the states that can reach an edited state may
+        # have changed their language since. The other (clean) states keep
+        # their own blocks and are registered by their signatures (acceptance
+        # and successor blocks). The affected states are then resolved from
+        # the edited states backwards, once all of their successors are: a
+        # state with the signature of a registered block is equivalent to it,
+        # and otherwise it gets a new block. Returns None if too many states
+        # are affected, or if some of them lie on cycles among the affected
+        # states, whose blocks cannot be resolved this way
+        table = self._class_table
+        num_states = len(table)
+        predecessors = [[] for _ in table]
+        for p, row in enumerate(table):
+            for q in row:
+                if q is not None:
+                    predecessors[q].append(p)
+        affected_states = set(self._dirty_states)
+        stack = list(affected_states)
         while stack:
-            p = stack.pop()
-            if p not in partition_to_state:
-                partition_to_state[p] = len(partition_to_state)
-            for symbol in self._alphabet:
-                q = get_partition(self.get_transition(p, symbol))
-                transitions.append((p, symbol, q))
-                if not processed[q]:
-                    stack.append(q)
-                    processed[q] = True
+            q = stack.pop()
+            for p in predecessors[q]:
+                if p not in affected_states:
+                    affected_states.add(p)
+                    if len(affected_states) > num_states // 2:
+                        return None
+                    stack.append(p)
 
-        self._num_states = 0
-        self._transitions = dict()
-        self.get_new_states(len(partition_to_state))
-        self.set_initial_state(
-            partition_to_state[get_partition(self._initial_state)]
+        accepting_states = self._accepting_states
+        block = list(range(num_states))
+        register = {
+            (p in accepting_states, row): p
+            for p, row in enumerate(table) if p not in affected_states
+        }
+
+        # Number of successors of each affected state that are not resolved
+        num_unresolved = dict()
+        for p in affected_states:
+            num_unresolved[p] = sum(q in affected_states for q in table[p])
+        ready = [p for p, n in num_unresolved.items() if n == 0]
+        num_resolved = 0
+        while ready:
+            p = ready.pop()
+            num_resolved += 1
+            if phase_budget is not None:
+                phase_budget.check(states=len(register))
+            signature = (
+                p in accepting_states,
+                tuple(None if q is None else block[q] for q in table[p])
+            )
+            block[p] = register.setdefault(signature, num_states + p)
+            for x in predecessors[p]:
+                if x in num_unresolved:
+                    num_unresolved[x] -= 1
+                    if num_unresolved[x] == 0:
+                        ready.append(x)
+        if num_resolved < len(affected_states):
+            return None
+        return block, num_resolved
+
+    def canonical_form(self):
+        # Returns a representation of this DFA that is the same for all
+        # minimal DFAs of the same language: the states are numbered in
+        # breadth-first order from the initial state, following symbols in
+        # sorted order. Symbols that lead every state to a state that can
+        # never accept are left out, since they behave exactly like symbols
+        # outside the alphabet
+        self._finalize()
+        fixed_states = self._get_fixed_states(self._alphabet)
+        symbols = sorted(
+            (
+                (symbol, c)
+                for c, class_symbols in enumerate(self._class_symbols)
+                if any(
+                    fixed_states.get(row[c]) is not _Reject
+                    for row in self._class_table
+                )
+                for symbol in class_symbols
+            ),
+            key=lambda symbol_c: str(symbol_c[0])
         )
-        new_accepting_states = [
-            partition_to_state[get_partition(p)] for p in self._accepting_states
+
+        state_nums = {self._initial_state: 0}
+        q = deque([self._initial_state])
+        canonical_form = []
+        while q:
+            p = q.popleft()
+            transitions = []
+            for symbol, c in symbols:
+                to_state = self._class_table[p][c]
+                if to_state not in state_nums:
+                    state_nums[to_state] = len(state_nums)
+                    q.append(to_state)
+                transitions.append(state_nums[to_state])
+            canonical_form.append((p in self._accepting_states, transitions))
+        return [str(symbol) for symbol, _ in symbols], canonical_form
+
+    def to_regex(self, max_length=None):
+        # Converts the DFA into a regular expression by state elimination.
+        # Eliminating the states of the minimal DFA of the reversed language
+        # and reversing the result gives the same language, and that DFA can
+        # be exponentially smaller (e.g. for (a|b)*a(a|b){k}), so it is used
+        # instead whenever it is smaller; its construction is cut off as soon
+        # as it gets larger than this DFA. The expression can still be
+        # exponentially long, so if max_length is given, a ValueError is
+        # raised instead when its (estimated) length is greater
+        self._finalize()
+        if not self._accepting_states:
+            return Regex._from_expr(_regex._EMPTY)
+        reverse_budget = budget.Budget(max_states=self.get_num_states())
+        try:
+            with reverse_budget:
+                reverse = Dfa.from_nfa(self.reverse())
+                reverse.minimize()
+        except budget.BudgetExceeded as e:
+            if e.budget is not reverse_budget:
+                raise
+            reverse = None
+
+        if (
+            reverse is not None and
+            reverse.get_num_states() < self.get_num_states()
+        ):
+            reverse._finalize()
+            expr = _regex._reverse(reverse._eliminate_states(), dict())
+        else:
+            expr = self._eliminate_states()
+        if max_length is not None:
+            length = _regex._get_size(expr, dict())
+            if length > max_length:
+                raise ValueError(
+                    f"The regular expression would be about {length} "
+                    f"characters long, more than max_length={max_length}"
+                )
+        return Regex._from_expr(expr)
+
+    def _eliminate_states(self):
+        # Returns an expression for the language of the DFA. States that can
+        # never accept are dropped first, and the remaining states are
+        # eliminated in order of increasing weight, i.e. the estimated growth
+        # of the expression caused by eliminating them
+        fixed_states = self._get_fixed_states(self._alphabet)
+        if fixed_states.get(self._initial_state) is _Reject:
+            return _regex._EMPTY
+        phase_stats = stats.start_phase("state_elimination")
+        phase_budget = budget.start_phase("state_elimination")
+
+        start, final = "start", "final"
+        edges = dict()
+        out_states = {start: set(), final: set()}
+        in_states = {start: set(), final: set()}
+
+        def add_edge(p, q, expr):
+            if (p, q) in edges:
+                expr = _regex._union(edges[p, q], expr)
+            edges[p, q] = expr
+            out_states[p].add(q)
+            in_states[q].add(p)
+
+        live_states = [
+            p for p in self.get_states() if fixed_states.get(p) is not _Reject
         ]
-        self._accepting_states = set()
-        self.set_accepting_states(*new_accepting_states)
-        for p, symbol, q in transitions:
-            self.set_transition(
-                partition_to_state[p], symbol, partition_to_state[q]
+        for p in live_states:
+            out_states[p] = set()
+            in_states[p] = set()
+        add_edge(start, self._initial_state, _regex._EPSILON)
+        num_transitions = 0
+        for p in live_states:
+            if p in self._accepting_states:
+                add_edge(p, final, _regex._EPSILON)
+            for c, q in enumerate(self._class_table[p]):
+                if q is None or fixed_states.get(q) is _Reject:
+                    continue
+                add_edge(p, q, _regex._union(*[
+                    _regex._symbol(symbol)
+                    for symbol in self._class_symbols[c]
+                ]))
+                num_transitions += len(self._class_symbols[c])
+
+        sizes = dict()
+        def get_weight(k):
+            in_size = sum(
+                _regex._get_size(edges[p, k], sizes)
+                for p in in_states[k] if p != k
+            )
+            out_size = sum(
+                _regex._get_size(edges[k, q], sizes)
+                for q in out_states[k] if q != k
             )
+            num_in = len(in_states[k] - {k})
+            num_out = len(out_states[k] - {k})
+            loop_size = (
+                _regex._get_size(edges[k, k], sizes) if (k, k) in edges else 0
+            )
+            return (
+                in_size * (num_out - 1) + out_size * (num_in - 1) +
+                loop_size * (num_in * num_out - 1)
+            )
+
+        # Only the weights of the neighbors of an eliminated state change
+        weights = {p: (get_weight(p), p) for p in live_states}
+        while weights:
+            if phase_budget is not None:
+                phase_budget.check(states=len(weights))
+            k = min(weights, key=weights.get)
+            del weights[k]
+            loop = _regex._star(edges.pop((k, k), _regex._EMPTY))
+            out_states[k].discard(k)
+            in_states[k].discard(k)
+            for p in in_states[k]:
+                out_states[p].discard(k)
+            for q in out_states[k]:
+                in_states[q].discard(k)
+            for p in in_states[k]:
+                for q in out_states[k]:
+                    add_edge(p, q, _regex._concat(
+                        edges[p, k], loop, edges[k, q]
+                    ))
+            for p in in_states[k]:
+                del edges[p, k]
+            for q in out_states[k]:
+                del edges[k, q]
+            for p in in_states[k] | out_states[k]:
+                if p in weights:
+                    weights[p] = (get_weight(p), p)
+            del in_states[k], out_states[k]
+
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=len(live_states), transitions=num_transitions,
+                iterations=len(live_states)
+            )
+        return edges.get((start, final), _regex._EMPTY)
+
+    def compile_matcher(self):
+        # Returns a function that checks whether a string is accepted by this
+        # DFA. Each state gets a jump dict from symbols directly to the bound
+        # get method of the jump dict of the next state, so each symbol costs
+        # a single call, and transitions into states that can never accept
+        # again are left out so that matching stops early
+        self._finalize()
+        fixed_states = self._get_fixed_states(self._alphabet)
+        if fixed_states.get(self._initial_state) is _Reject:
+            return lambda string: False
 
-        self.minimized = True
+        jumps = [dict() for _ in self._class_table]
+        jump_gets = [jump.get for jump in jumps]
+        for jump, row in zip(jumps, self._class_table):
+            for c, q in enumerate(row):
+                if q is None or fixed_states.get(q) is _Reject:
+                    continue
+                for symbol in self._class_symbols[c]:
+                    jump[symbol] = jump_gets[q]
+        accepting_gets = {jump_gets[p] for p in self._accepting_states}
+        initial_get = jump_gets[self._initial_state]
+
+        def match(string):
+            get = initial_get
+            for symbol in string:
+                get = get(symbol)
+                if get is None:
+                    return False
+            return get in accepting_gets
+
+        return match
 
     def complement(self):
         self._finalize()
@@ -177,13 +807,170 @@ class Dfa(Nfa):
         ])
         dfa._add_transitions_from(self)
 
+        # The complement has exactly the same transitions, so it can reuse
+        # the symbol classes and the class table instead of recomputing them
+        dfa._alphabet = self._alphabet
+        dfa._eps_closure = self._eps_closure
+        dfa._symbol_class = self._symbol_class
+        dfa._class_symbols = self._class_symbols
+        dfa._class_table = self._class_table
+        dfa._finalized = True
+        # Complementing a minimal DFA keeps it minimal
+        if self._minimized:
+            dfa._minimized = True
+            dfa._dirty_states = set()
+
+        return dfa
+
+    def _get_fixed_states(self, alphabet):
+        # Returns the states from which either every reachable state is
+        # accepting (mapped to _Accept) or no reachable state is accepting
+        # (mapped to _Reject), when reading symbols from the given alphabet.
+        # Symbols without a transition lead to an implicit rejecting sink
+        self._finalize()
+        states = self.get_states()
+        predecessors = [set() for _ in states]
+        incomplete = set()
+        for p, row in enumerate(self._class_table):
+            for q in row:
+                if q is None:
+                    incomplete.add(p)
+                else:
+                    predecessors[q].add(p)
+        if not alphabet <= self._alphabet:
+            incomplete = set(states)
+
+        def get_backward_reachable(targets):
+            reachable = set(targets)
+            stack = list(targets)
+            while stack:
+                q = stack.pop()
+                for p in predecessors[q]:
+                    if p not in reachable:
+                        reachable.add(p)
+                        stack.append(p)
+            return reachable
+
+        can_accept = get_backward_reachable(self._accepting_states)
+        can_reject = get_backward_reachable(
+            incomplete.union(
+                p for p in states if p not in self._accepting_states
+            )
+        )
+        fixed_states = dict()
+        for p in states:
+            if p not in can_accept:
+                fixed_states[p] = _Reject
+            elif p not in can_reject:
+                fixed_states[p] = _Accept
+        return fixed_states
+
+    @staticmethod
+    def product(dfas, accept, absorbing=None):
+        # Builds a single DFA that runs all the given DFAs in parallel over
+        # the union of their alphabets; a state of the product is accepting
+        # iff accept returns True on the tuple of acceptances of the DFAs.
+        # Only reachable tuples are explored. Components that can no longer
+        # change their acceptance are collapsed, and if absorbing is True or
+        # False, a component fixed to that value decides the whole tuple
+        dfas = list(dfas)
+        for dfa in dfas:
+            dfa._finalize()
+        phase_stats = stats.start_phase("product")
+        phase_budget = budget.start_phase("product")
+        alphabet = set().union(*[dfa._alphabet for dfa in dfas])
+        fixed = [dfa._get_fixed_states(alphabet) for dfa in dfas]
+        if absorbing is not None:
+            absorbing = _Accept if absorbing else _Reject
+
+        signature_to_class = dict()
+        class_symbols = []
+        for symbol in alphabet:
+            signature = tuple(dfa._symbol_class.get(symbol) for dfa in dfas)
+            if signature not in signature_to_class:
+                signature_to_class[signature] = len(class_symbols)
+                class_symbols.append([])
+            class_symbols[signature_to_class[signature]].append(symbol)
+
+        # A tuple whose acceptance can no longer change is collapsed into
+        # _Accept or _Reject itself
+        def normalize(states):
+            if absorbing is not None and absorbing in states:
+                return absorbing
+            if all(p is _Accept or p is _Reject for p in states):
+                value = accept(tuple(p is _Accept for p in states))
+                return _Accept if value else _Reject
+            return states
+
+        def is_accepting(states):
+            if states is _Accept or states is _Reject:
+                return states is _Accept
+            return bool(accept(tuple(
+                p is _Accept or (
+                    p is not _Reject and p in dfa._accepting_states
+                )
+                for dfa, p in zip(dfas, states)
+            )))
+
+        def step(states, signature):
+            if states is _Accept or states is _Reject:
+                return states
+            to_states = []
+            for dfa, fixed_states, p, c in zip(dfas, fixed, states, signature):
+                if p is _Accept or p is _Reject:
+                    q = p
+                elif c is None:
+                    q = _Reject
+                else:
+                    q = dfa._class_table[p][c]
+                    q = _Reject if q is None else fixed_states.get(q, q)
+                to_states.append(q)
+            return normalize(tuple(to_states))
+
+        initial_state = normalize(tuple(
+            fixed_states.get(dfa._initial_state, dfa._initial_state)
+            for dfa, fixed_states in zip(dfas, fixed)
+        ))
+        product_states = {initial_state: 0}
+        q = deque([initial_state])
+        transitions = []
+        num_transitions = 0
+        while q:
+            from_states = q.popleft()
+            if phase_budget is not None:
+                phase_budget.check(
+                    states=len(product_states), transitions=num_transitions
+                )
+            for signature, c in signature_to_class.items():
+                to_states = step(from_states, signature)
+                if to_states not in product_states:
+                    product_states[to_states] = len(product_states)
+                    q.append(to_states)
+                transitions.append((from_states, c, to_states))
+                num_transitions += len(class_symbols[c])
+
+        dfa = Dfa()
+        dfa.get_new_states(len(product_states))
+        dfa.set_initial_state(0)
+        dfa.set_accepting_states(*[
+            p for states, p in product_states.items() if is_accepting(states)
+        ])
+        for from_states, c, to_states in transitions:
+            for symbol in class_symbols[c]:
+                dfa.set_transition(
+                    product_states[from_states], symbol,
+                    product_states[to_states]
+                )
+
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=len(product_states), transitions=num_transitions,
+                iterations=len(product_states)
+            )
         return dfa
 
     def intersect(self, other):
         self._finalize()
         if not isinstance(other, Dfa):
             other = Dfa.from_nfa(other)
-        return Dfa.from_nfa(
-            self.complement().union(other.complement())
-        ).complement()
-
+        return Dfa.product([self, other], all, absorbing=False)
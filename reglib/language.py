@@ -1,19 +1,46 @@
 from reglib.dfa import Dfa
 from collections import deque
+import hashlib
+import json
+import random
+
+def _multiply_matrices(a, b):
+    # Multiplies two sparse matrices given as lists of dicts mapping column
+    # indices to nonzero entries
+    product = []
+    for row in a:
+        product_row = dict()
+        for q, weight in row.items():
+            for r, other_weight in b[q].items():
+                product_row[r] = product_row.get(r, 0) + weight * other_weight
+        product.append(product_row)
+    return product
+
 
 class Language:
     def __init__(self, nfa):
         self._nfa = nfa
         self._dfa = None
+        self._matcher = None
+        self._counts = None
+        self._fingerprint = None
+        self._regex = None
+        self._bit_parallel_matcher = None
 
     @staticmethod
     def from_regex(regex):
-        return Language(regex.to_nfa())
+        lang = Language(regex.to_nfa())
+        lang._regex = regex
+        return lang
 
     @staticmethod
     def from_nfa(nfa):
         return Language(nfa)
 
+    @staticmethod
+    def from_words(words):
+        return Language(Dfa.from_words(words))
+
     def _finalize(self):
         if self._dfa is None:
             if isinstance(self._nfa, Dfa):
@@ -21,6 +48,50 @@ class Language:
             else:
                 self._dfa = Dfa.from_nfa(self._nfa)
             self._dfa.minimize()
+            self._dfa._finalize()
+
+    def fingerprint(self):
+        # Returns a hash of the canonical form of the minimal DFA, so that
+        # two languages are equal iff (barring hash collisions) they have
+        # the same fingerprint
+        if self._fingerprint is None:
+            self._finalize()
+            canonical_form = json.dumps(self._dfa.canonical_form())
+            self._fingerprint = hashlib.sha256(
+                canonical_form.encode("utf-8")
+            ).hexdigest()
+        return self._fingerprint
+
+    @staticmethod
+    def group_equivalent(languages):
+        # Groups the given languages into lists of equal languages, in the
+        # order of their first appearance
+        groups = dict()
+        for lang in languages:
+            groups.setdefault(lang.fingerprint(), []).append(lang)
+        return list(groups.values())
+
+    def to_regex(self, max_length=None):
+        self._finalize()
+        return self._dfa.to_regex(max_length)
+
+    def compile(self, determinize=True):
+        # Returns a function that checks whether a string is in this
+        # language; the function is built once and then cached. If
+        # determinize is False, the function simulates the Glushkov automaton
+        # of the regular expression of this language bit-parallelly instead,
+        # which avoids building a (possibly exponentially larger) DFA
+        if not determinize:
+            assert self._regex is not None, \
+                "Only languages created from a regular expression can be " \
+                "matched without determinization"
+            if self._bit_parallel_matcher is None:
+                self._bit_parallel_matcher = self._regex.to_bit_parallel()
+            return self._bit_parallel_matcher
+        if self._matcher is None:
+            self._finalize()
+            self._matcher = self._dfa.compile_matcher()
+        return self._matcher
 
     def union(self, other):
         return Language(self._nfa.union(other._nfa))
@@ -30,6 +101,34 @@ class Language:
         other._finalize()
         return Language(self._dfa.intersect(other._dfa))
 
+    @staticmethod
+    def _finalized_dfas(languages):
+        dfas = []
+        for lang in languages:
+            lang._finalize()
+            dfas.append(lang._dfa)
+        return dfas
+
+    @staticmethod
+    def combine(languages, accept):
+        # Returns the language of strings x such that accept returns True on
+        # the tuple of whether each language contains x
+        return Language(
+            Dfa.product(Language._finalized_dfas(languages), accept)
+        )
+
+    @staticmethod
+    def intersect_all(languages):
+        return Language(Dfa.product(
+            Language._finalized_dfas(languages), all, absorbing=False
+        ))
+
+    @staticmethod
+    def union_all(languages):
+        return Language(Dfa.product(
+            Language._finalized_dfas(languages), any, absorbing=True
+        ))
+
     def complement(self):
         self._finalize()
         return Language(self._dfa.complement())
@@ -50,32 +149,191 @@ class Language:
             # language, returns None
             q = deque()
             initial_state = self._dfa.get_initial_state()
-            q.append((initial_state, ""))
-            visited = {initial_state}
+            q.append(initial_state)
+            parents = {initial_state: None}
             accepting_states = self._dfa.get_accepting_states()
-            alphabet = self._dfa.get_alphabet()
+            table = self._dfa._class_table
+            class_symbols = self._dfa._class_symbols
             while len(q) > 0:
-                from_state, cur_str = q.popleft()
+                from_state = q.popleft()
                 if from_state in accepting_states:
-                    return cur_str
-                for symbol in alphabet:
-                    to_state = self._dfa.get_transition(from_state, symbol)
-                    if to_state not in visited:
-                        visited.add(to_state)
-                        q.append((to_state, cur_str + symbol))
+                    symbols = []
+                    while parents[from_state] is not None:
+                        from_state, symbol = parents[from_state]
+                        symbols.append(symbol)
+                    return "".join(reversed(symbols))
+                for c, to_state in enumerate(table[from_state]):
+                    if to_state not in parents:
+                        parents[to_state] = (from_state, class_symbols[c][0])
+                        q.append(to_state)
             return None
         elif isinstance(x, str):
             # Checks if the string is in the language
+            if self._matcher is not None:
+                return self._matcher(x)
             state = self._dfa.get_initial_state()
-            alphabet = self._dfa.get_alphabet()
+            symbol_class = self._dfa._symbol_class
+            table = self._dfa._class_table
             for symbol in x:
-                if symbol not in alphabet:
+                c = symbol_class.get(symbol)
+                if c is None:
                     return False
-                state = self._dfa.get_transition(state, symbol)
+                state = table[state][c]
             return state in self._dfa.get_accepting_states()
         elif isinstance(x, Language):
-            # Checks if the entire language x is contained in this language
-            return self.complement().intersect(x).is_empty()
+            # Checks if the entire language x is contained in this language,
+            # i.e. if no string is in x but not in this language
+            return Language.combine(
+                [self, x], lambda in_langs: in_langs[1] and not in_langs[0]
+            ).is_empty()
+
+    def _get_counts(self, n):
+        # Returns a list whose k-th element, for k = 0, ..., n, maps each
+        # state to the number of strings of length k accepted from it
+        self._finalize()
+        if self._counts is None:
+            accepting_states = self._dfa.get_accepting_states()
+            self._counts = [[
+                1 if p in accepting_states else 0
+                for p in self._dfa.get_states()
+            ]]
+        table = self._dfa._class_table
+        class_sizes = [len(symbols) for symbols in self._dfa._class_symbols]
+        while len(self._counts) <= n:
+            prev_counts = self._counts[-1]
+            self._counts.append([
+                sum(
+                    size * prev_counts[q]
+                    for size, q in zip(class_sizes, row)
+                )
+                for row in table
+            ])
+        return self._counts
+
+    def count(self, n):
+        # Returns the number of strings of length n in the language, without
+        # keeping the counts of the shorter lengths unless they are cached
+        # already. The counts are the accepting vector multiplied n times by
+        # the matrix of the numbers of symbols between each pair of states,
+        # so for large n the matrix is raised to the n-th power by repeated
+        # squaring instead
+        self._finalize()
+        initial_state = self._dfa.get_initial_state()
+        if self._counts is not None and len(self._counts) > n:
+            return self._counts[n][initial_state]
+
+        accepting_states = self._dfa.get_accepting_states()
+        counts = [
+            1 if p in accepting_states else 0 for p in self._dfa.get_states()
+        ]
+        table = self._dfa._class_table
+        class_sizes = [len(symbols) for symbols in self._dfa._class_symbols]
+        num_states = len(table)
+        if n * len(class_sizes) <= num_states ** 2 * n.bit_length():
+            for _ in range(n):
+                counts = [
+                    sum(size * counts[q] for size, q in zip(class_sizes, row))
+                    for row in table
+                ]
+            return counts[initial_state]
+
+        matrix = []
+        for row in table:
+            weights = dict()
+            for size, q in zip(class_sizes, row):
+                weights[q] = weights.get(q, 0) + size
+            matrix.append(weights)
+        while True:
+            if n & 1:
+                counts = [
+                    sum(weight * counts[q] for q, weight in weights.items())
+                    for weights in matrix
+                ]
+            n >>= 1
+            if n == 0:
+                return counts[initial_state]
+            matrix = _multiply_matrices(matrix, matrix)
+
+    def _strings_of_length(self, n):
+        counts = self._get_counts(n)
+        table = self._dfa._class_table
+        symbols = sorted(
+            (symbol, c)
+            for c, class_symbols in enumerate(self._dfa._class_symbols)
+            for symbol in class_symbols
+        )
+        initial_state = self._dfa.get_initial_state()
+        if counts[n][initial_state] == 0:
+            return
+
+        # Depth-first search in lexicographic order that only enters states
+        # from which the rest of the string can still be completed
+        prefix = []
+        stack = [(initial_state, 0)]
+        while stack:
+            p, i = stack.pop()
+            remaining = n - len(prefix)
+            if remaining > 0:
+                remaining_counts = counts[remaining - 1]
+                while i < len(symbols):
+                    symbol, c = symbols[i]
+                    i += 1
+                    q = table[p][c]
+                    if remaining_counts[q] > 0:
+                        stack.append((p, i))
+                        stack.append((q, 0))
+                        prefix.append(symbol)
+                        break
+                else:
+                    if prefix:
+                        prefix.pop()
+            else:
+                yield "".join(prefix)
+                if prefix:
+                    prefix.pop()
+
+    def strings(self, max_length=None):
+        # Lazily generates the strings in the language in length-lexicographic
+        # order, up to the given length or forever if max_length is None
+        self._finalize()
+        num_states = self._dfa.get_num_states()
+        num_empty_lengths = 0
+        n = 0
+        initial_state = self._dfa.get_initial_state()
+        while max_length is None or n <= max_length:
+            if self._get_counts(n)[n][initial_state] == 0:
+                # A language without strings of num_states consecutive
+                # lengths has no longer strings either
+                num_empty_lengths += 1
+                if num_empty_lengths >= num_states:
+                    return
+            else:
+                num_empty_lengths = 0
+                yield from self._strings_of_length(n)
+            n += 1
+
+    def sample(self, n, rng=random):
+        # Returns a string chosen uniformly at random among the strings of
+        # length n in the language, or None if there are no such strings
+        counts = self._get_counts(n)
+        table = self._dfa._class_table
+        class_symbols = self._dfa._class_symbols
+        state = self._dfa.get_initial_state()
+        if counts[n][state] == 0:
+            return None
+
+        symbols = []
+        for remaining in range(n, 0, -1):
+            remaining_counts = counts[remaining - 1]
+            k = rng.randrange(counts[remaining][state])
+            for c, q in enumerate(table[state]):
+                weight = len(class_symbols[c]) * remaining_counts[q]
+                if k < weight:
+                    symbols.append(class_symbols[c][k // remaining_counts[q]])
+                    state = q
+                    break
+                k -= weight
+        return "".join(symbols)
 
     def is_empty(self):
         return self.contains() is None
@@ -1,8 +1,33 @@
-import pygraphviz as pgv
+from reglib import stats
+from collections import deque
+import io
 
 class EPS:
     pass
 
+def _get_dot_label(symbols):
+    # Merges the symbols of parallel edges into a single label, writing runs
+    # of at least three consecutive characters as ranges (e.g. "a-z")
+    parts = ["ε"] if EPS in symbols else []
+    chars = sorted((symbol for symbol in symbols if symbol is not EPS), key=str)
+    i = 0
+    while i < len(chars):
+        j = i
+        while (
+            j + 1 < len(chars) and
+            isinstance(chars[j], str) and isinstance(chars[j + 1], str) and
+            len(chars[j]) == 1 and len(chars[j + 1]) == 1 and
+            ord(chars[j + 1]) == ord(chars[j]) + 1
+        ):
+            j += 1
+        if j - i >= 2:
+            parts.append(f"{chars[i]}-{chars[j]}")
+        else:
+            parts.extend(str(symbol) for symbol in chars[i:j + 1])
+        i = j + 1
+    label = ", ".join(parts)
+    return label.replace("\\", "\\\\").replace('"', '\\"')
+
 class Nfa:
     def __init__(self):
         self._num_states = 0
@@ -72,6 +97,7 @@ class Nfa:
 
     def _finalize(self):
         if not self._finalized:
+            phase_stats = stats.start_phase("eps_closure")
             self._alphabet = set()
             for from_state, transitions_from_state in self._transitions.items():
                 self._alphabet = self._alphabet.union(
@@ -103,6 +129,22 @@ class Nfa:
 
             self._finalized = True
 
+            if phase_stats is not None:
+                phase_stats.finish(
+                    states=self._num_states,
+                    transitions=self._get_num_transitions(),
+                    peak_subset_size=max(
+                        map(len, self._eps_closure.values()), default=0
+                    )
+                )
+
+    def _get_num_transitions(self):
+        return sum(
+            len(to_states)
+            for transitions_from_state in self._transitions.values()
+            for to_states in transitions_from_state.values()
+        )
+
     def get_alphabet(self):
         self._finalize()
         return self._alphabet
@@ -186,24 +228,66 @@ class Nfa:
 
         return nfa
 
-    def to_graphviz(self, filename):
-        self._finalize()
+    def to_dot(self, file, max_states=None):
+        # Writes the automaton in the DOT format to the given filename or
+        # file object, one line at a time. If max_states is given and the
+        # automaton has more states, only the first max_states states in
+        # breadth-first order from the initial state are written, and the
+        # edges leaving them point to a single "..." node
+        if isinstance(file, str):
+            with open(file, "w", encoding="utf-8") as f:
+                self.to_dot(f, max_states=max_states)
+            return
 
-        g = pgv.AGraph(strict=False, directed=True)
-        for state in self.get_states():
-            if state in self._accepting_states:
-                g.add_node(state, shape="doublecircle")
-            else:
-                g.add_node(state)
-
-        for from_state, transitions_from_state in self._transitions.items():
+        self._finalize()
+        if max_states is None or self._num_states <= max_states:
+            states = self.get_states()
+        else:
+            states = dict()
+            q = deque([self._initial_state])
+            states[self._initial_state] = None
+            while q and len(states) < max_states:
+                from_state = q.popleft()
+                for to_states in self._transitions.get(from_state, {}).values():
+                    for to_state in to_states:
+                        if to_state not in states and len(states) < max_states:
+                            states[to_state] = None
+                            q.append(to_state)
+
+        # The "..." node is only written if some edge leaves the kept states
+        edges = []
+        truncated = False
+        for from_state in states:
+            edges_from_state = dict()
+            transitions_from_state = self._transitions.get(from_state, {})
             for symbol, to_states in transitions_from_state.items():
                 for to_state in to_states:
-                    if symbol == EPS:
-                        g.add_edge(from_state, to_state, label="ε")
-                    else:
-                        g.add_edge(from_state, to_state, label=symbol)
-
+                    if to_state not in states:
+                        to_state = "truncated"
+                        truncated = True
+                    edges_from_state.setdefault(to_state, set()).add(symbol)
+            edges.append((from_state, edges_from_state))
+
+        file.write("digraph {\n")
+        for state in states:
+            if state in self._accepting_states:
+                file.write(f"  {state} [shape=doublecircle];\n")
+            else:
+                file.write(f"  {state};\n")
+        if truncated:
+            file.write('  truncated [label="...", shape=plaintext];\n')
+
+        for from_state, edges_from_state in edges:
+            for to_state, symbols in edges_from_state.items():
+                label = _get_dot_label(symbols)
+                file.write(f'  {from_state} -> {to_state} [label="{label}"];\n')
+        file.write("}\n")
+
+    def to_graphviz(self, filename, max_states=None):
+        import pygraphviz as pgv
+
+        dot = io.StringIO()
+        self.to_dot(dot, max_states=max_states)
+        g = pgv.AGraph(string=dot.getvalue())
         g.layout(prog="dot")
         g.draw(filename)
-        
@@ -1,4 +1,7 @@
 from reglib.nfa import Nfa
+from reglib import stats
+from reglib.bitparallel import BitParallelMatcher
+import weakref
 
 _RESERVED_CHARS = {'(', ')', '*', '+', '|'}
 
@@ -8,6 +11,29 @@ class _Source:
         self.pos = 0
 
 
+class _Glushkov:
+    # Positions and follow sets of the Glushkov automaton of a regular
+    # expression; position 0 is the initial state, and every occurrence of a
+    # symbol in the expression gets its own position
+    def __init__(self):
+        self.follow = [0]
+        self.symbol_masks = dict()
+
+    def get_new_position(self, letter):
+        position = len(self.follow)
+        self.follow.append(0)
+        self.symbol_masks[letter] = (
+            self.symbol_masks.get(letter, 0) | (1 << position)
+        )
+        return position
+
+    def add_follow(self, from_positions, to_positions):
+        while from_positions:
+            lowest_bit = from_positions & -from_positions
+            self.follow[lowest_bit.bit_length() - 1] |= to_positions
+            from_positions ^= lowest_bit
+
+
 class _EmptyNode:
     def to_nfa(self):
         nfa = Nfa()
@@ -15,6 +41,11 @@ class _EmptyNode:
         nfa.set_initial_state(q0)
         return nfa
 
+    def glushkov(self, glushkov):
+        # Returns whether the empty string is in the language, and the masks
+        # of the positions that can be first and last in a string
+        return False, 0, 0
+
 
 class _TermNode:
     def __init__(self, letter):
@@ -54,6 +85,10 @@ class _TermNode:
         nfa.set_transition(q0, self.letter, q1)
         return nfa
 
+    def glushkov(self, glushkov):
+        position_mask = 1 << glushkov.get_new_position(self.letter)
+        return False, position_mask, position_mask
+
 
 class _StarNode:
     def __init__(self, node):
@@ -80,6 +115,11 @@ class _StarNode:
     def to_nfa(self):
         return self.node.to_nfa().star()
 
+    def glushkov(self, glushkov):
+        _, first, last = self.node.glushkov(glushkov)
+        glushkov.add_follow(last, first)
+        return True, first, last
+
 
 class _ConcatNode:
     def __init__(self, node1, node2):
@@ -101,6 +141,16 @@ class _ConcatNode:
     def to_nfa(self):
         return self.node1.to_nfa().concat(self.node2.to_nfa())
 
+    def glushkov(self, glushkov):
+        nullable1, first1, last1 = self.node1.glushkov(glushkov)
+        nullable2, first2, last2 = self.node2.glushkov(glushkov)
+        glushkov.add_follow(last1, first2)
+        return (
+            nullable1 and nullable2,
+            first1 | first2 if nullable1 else first1,
+            last1 | last2 if nullable2 else last2,
+        )
+
 
 class _UnionNode:
     def __init__(self, node1, node2):
@@ -126,10 +176,288 @@ class _UnionNode:
     def to_nfa(self):
         return self.node1.to_nfa().union(self.node2.to_nfa())
 
+    def glushkov(self, glushkov):
+        nullable1, first1, last1 = self.node1.glushkov(glushkov)
+        nullable2, first2, last2 = self.node2.glushkov(glushkov)
+        return nullable1 or nullable2, first1 | first2, last1 | last2
+
+
+# Simplifying constructors for regular expressions built by programs (e.g.
+# state elimination). Expressions are hash-consed, so equal subexpressions
+# are the same object, and hashing or comparing them takes constant time
+class _Expr:
+    __slots__ = ("kind", "args", "__weakref__")
+
+_exprs = weakref.WeakValueDictionary()
+
+def _make_expr(kind, args):
+    key = (kind, args)
+    expr = _exprs.get(key)
+    if expr is None:
+        expr = _Expr()
+        expr.kind = kind
+        expr.args = args
+        _exprs[key] = expr
+    return expr
+
+_EMPTY = _make_expr("empty", ())
+_EPSILON = _make_expr("eps", ())
+
+def _symbol(symbol):
+    return _make_expr("sym", (symbol,))
+
+def _split_first(expr):
+    if expr.kind == "concat":
+        return expr.args[0], _concat(*expr.args[1:])
+    return expr, _EPSILON
+
+def _split_last(expr):
+    if expr.kind == "concat":
+        return expr.args[-1], _concat(*expr.args[:-1])
+    return expr, _EPSILON
+
+def _factor(members, split, join):
+    # Factors the members sharing a first (or last) part out of the union,
+    # e.g. xy|xz becomes x(y|z)
+    groups = dict()
+    for member in members:
+        common, rest = split(member)
+        groups.setdefault(common, []).append(rest)
+    if len(groups) == len(members):
+        return members
+    return {
+        join(common, _union(*rests)) for common, rests in groups.items()
+    }
+
+def _union(*exprs):
+    members = set()
+    for expr in exprs:
+        if expr.kind == "union":
+            members.update(expr.args)
+        elif expr is not _EMPTY:
+            members.add(expr)
+    members = _factor(members, _split_first, _concat)
+    members = _factor(
+        members, _split_last, lambda last, rest: _concat(rest, last)
+    )
+    if _EPSILON in members:
+        # ε|xx* is the same as x*
+        members = {
+            m.args[1] if (
+                m.kind == "concat" and len(m.args) == 2 and
+                m.args[1].kind == "star" and m.args[1].args[0] is m.args[0]
+            ) else m
+            for m in members
+        }
+        if any(m.kind == "star" for m in members):
+            members.remove(_EPSILON)
+    if not members:
+        return _EMPTY
+    if len(members) == 1:
+        member, = members
+        return member
+    return _make_expr("union", frozenset(members))
+
+def _concat(*exprs):
+    parts = []
+    for expr in exprs:
+        if expr is _EMPTY:
+            return _EMPTY
+        for part in (expr.args if expr.kind == "concat" else (expr,)):
+            if part is _EPSILON:
+                continue
+            if parts and part.kind == "star" and parts[-1] is part:
+                continue
+            if (
+                parts and parts[-1].kind == "star" and
+                parts[-1].args[0] is part
+            ):
+                # x*x is written as xx*, so that it renders as x+
+                parts.insert(len(parts) - 1, part)
+                continue
+            parts.append(part)
+    if not parts:
+        return _EPSILON
+    if len(parts) == 1:
+        return parts[0]
+    return _make_expr("concat", tuple(parts))
+
+def _star(expr):
+    if expr is _EMPTY or expr is _EPSILON:
+        return _EPSILON
+    if expr.kind == "star":
+        return expr
+    if expr.kind == "union":
+        # (ε|x|y*)* is the same as (x|y)*
+        expr = _union(*[
+            m.args[0] if m.kind == "star" else m
+            for m in expr.args if m is not _EPSILON
+        ])
+    return _make_expr("star", (expr,))
+
+def _reverse(expr, reversed_exprs):
+    # Returns an expression for the reversed strings of the expression
+    if expr not in reversed_exprs:
+        kind = expr.kind
+        if kind == "star":
+            reversed_expr = _star(_reverse(expr.args[0], reversed_exprs))
+        elif kind == "union":
+            reversed_expr = _union(*[
+                _reverse(m, reversed_exprs) for m in expr.args
+            ])
+        elif kind == "concat":
+            reversed_expr = _concat(*[
+                _reverse(part, reversed_exprs) for part in reversed(expr.args)
+            ])
+        else:
+            reversed_expr = expr
+        reversed_exprs[expr] = reversed_expr
+    return reversed_exprs[expr]
+
+def _get_size(expr, sizes):
+    # Returns (an estimate of) the length of the rendered expression
+    if expr not in sizes:
+        if expr.kind in {"sym", "eps", "empty"}:
+            size = 1
+        elif expr.kind == "star":
+            size = _get_size(expr.args[0], sizes) + 3
+        elif expr.kind == "union":
+            size = sum(_get_size(m, sizes) + 1 for m in expr.args) + 1
+        else:
+            size = sum(_get_size(part, sizes) for part in expr.args)
+        sizes[expr] = size
+    return sizes[expr]
+
+def _render_postfix(expr, op):
+    # A term can only have one postfix operator, so anything other than a
+    # single symbol (except '?', see _render) is parenthesized
+    if expr.kind == "sym" and expr.args[0] != '?':
+        return expr.args[0] + op
+    return "(" + _render(expr) + ")" + op
+
+def _render(expr):
+    kind = expr.kind
+    if kind == "sym":
+        symbol = expr.args[0]
+        if (
+            not isinstance(symbol, str) or len(symbol) != 1 or
+            symbol in _RESERVED_CHARS or symbol in {'ε', '∅'}
+        ):
+            raise ValueError(
+                f"Symbol {symbol!r} cannot be written in a regular expression"
+            )
+        # '?' is only a symbol at the start of a term
+        return "(?)" if symbol == '?' else symbol
+    elif kind == "eps":
+        return "ε"
+    elif kind == "empty":
+        return "∅"
+    elif kind == "star":
+        return _render_postfix(expr.args[0], "*")
+    elif kind == "union":
+        others = [m for m in expr.args if m is not _EPSILON]
+        if len(others) < len(expr.args):
+            if len(others) == 1:
+                return _render_postfix(others[0], "?")
+            return "(" + "|".join(sorted(map(_render, others))) + ")?"
+        return "|".join(sorted(map(_render, others)))
+    else:
+        parts = expr.args
+        strings = []
+        i = 0
+        while i < len(parts):
+            part = parts[i]
+            if (
+                i + 1 < len(parts) and parts[i + 1].kind == "star" and
+                parts[i + 1].args[0] is part
+            ):
+                strings.append(_render_postfix(part, "+"))
+                i += 2
+                continue
+            string = _render(part)
+            if part.kind == "union" and _EPSILON not in part.args:
+                string = "(" + string + ")"
+            strings.append(string)
+            i += 1
+        return "".join(strings)
+
+def _to_node(expr, nodes):
+    # Converts the expression into the nodes the parser would produce for
+    # its rendering, sharing the nodes of shared subexpressions
+    if expr not in nodes:
+        kind = expr.kind
+        if kind == "sym":
+            node = _TermNode(expr.args[0])
+        elif kind == "eps":
+            node = _StarNode(_EmptyNode())
+        elif kind == "empty":
+            node = _EmptyNode()
+        elif kind == "star":
+            node = _StarNode(_to_node(expr.args[0], nodes))
+        else:
+            node_class = _UnionNode if kind == "union" else _ConcatNode
+            node = None
+            for arg in expr.args:
+                arg_node = _to_node(arg, nodes)
+                node = arg_node if node is None else node_class(node, arg_node)
+        nodes[expr] = node
+    return nodes[expr]
+
 
 class Regex:
     def __init__(self, string):
+        self._string = string
+        phase_stats = stats.start_phase("parse")
         self.node = _UnionNode.parse(_Source(string))
+        if phase_stats is not None:
+            phase_stats.finish(iterations=len(string))
 
     def to_nfa(self):
-        return self.node.to_nfa()
+        phase_stats = stats.start_phase("thompson")
+        nfa = self.node.to_nfa()
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=nfa.get_num_states(),
+                transitions=nfa._get_num_transitions()
+            )
+        return nfa
+
+    def to_bit_parallel(self):
+        # Returns a BitParallelMatcher that checks if a string matches this
+        # regular expression by simulating its Glushkov automaton, without
+        # determinizing it
+        phase_stats = stats.start_phase("glushkov")
+        glushkov = _Glushkov()
+        nullable, first, last = self.node.glushkov(glushkov)
+        glushkov.follow[0] = first
+        matcher = BitParallelMatcher(
+            glushkov.follow, glushkov.symbol_masks,
+            last | 1 if nullable else last
+        )
+        if phase_stats is not None:
+            phase_stats.finish(
+                states=len(glushkov.follow),
+                transitions=sum(
+                    bin(follow).count("1") for follow in glushkov.follow
+                )
+            )
+        return matcher
+
+    @staticmethod
+    def _from_expr(expr):
+        # The string is only rendered when it is first used, since the
+        # symbols of a DFA built by a program may not be writable in one
+        regex = Regex.__new__(Regex)
+        regex._string = None
+        regex._expr = expr
+        regex.node = _to_node(expr, dict())
+        return regex
+
+    @property
+    def string(self):
+        if self._string is None:
+            self._string = _render(self._expr)
+        return self._string
+
+    def __str__(self):
+        return self.string
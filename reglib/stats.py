@@ -0,0 +1,99 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Callbacks that receive a PhaseStats object every time a phase finishes in
+# any thread, and those of the collect_stats() blocks active in the current
+# thread (or task) only; when there are no callbacks, no statistics are
+# recorded at all
+_hooks = []
+_collectors = contextvars.ContextVar("collectors", default=())
+
+class PhaseStats:
+    def __init__(self, phase):
+        self.phase = phase
+        self.seconds = None
+        self.states = None
+        self.transitions = None
+        self.peak_subset_size = None
+        self.iterations = None
+        self._start = time.perf_counter()
+
+    def finish(
+        self, states=None, transitions=None, peak_subset_size=None,
+        iterations=None
+    ):
+        self.seconds = time.perf_counter() - self._start
+        self.states = states
+        self.transitions = transitions
+        self.peak_subset_size = peak_subset_size
+        self.iterations = iterations
+        for hook in list(_hooks) + list(_collectors.get()):
+            hook(self)
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "seconds": self.seconds,
+            "states": self.states,
+            "transitions": self.transitions,
+            "peak_subset_size": self.peak_subset_size,
+            "iterations": self.iterations,
+        }
+
+
+class Stats:
+    # Aggregates the statistics of all the phases reported to it, per phase
+    def __init__(self):
+        self.phases = dict()
+
+    def record(self, phase_stats):
+        phase = self.phases.setdefault(phase_stats.phase, {
+            "calls": 0,
+            "seconds": 0.0,
+            "states": 0,
+            "transitions": 0,
+            "peak_subset_size": 0,
+            "iterations": 0,
+        })
+        phase["calls"] += 1
+        phase["seconds"] += phase_stats.seconds
+        for key in ("states", "transitions", "iterations"):
+            value = getattr(phase_stats, key)
+            if value is not None:
+                phase[key] += value
+        if phase_stats.peak_subset_size is not None:
+            phase["peak_subset_size"] = max(
+                phase["peak_subset_size"], phase_stats.peak_subset_size
+            )
+
+    def as_dict(self):
+        return {phase: dict(values) for phase, values in self.phases.items()}
+
+
+def add_hook(hook):
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def start_phase(phase):
+    # Returns a PhaseStats object to be finished at the end of the phase, or
+    # None if no hooks are installed
+    if not _hooks and not _collectors.get():
+        return None
+    return PhaseStats(phase)
+
+
+@contextmanager
+def collect_stats():
+    # Aggregates the statistics of all the phases run inside the block by the
+    # current thread (or task)
+    stats = Stats()
+    token = _collectors.set(_collectors.get() + (stats.record,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
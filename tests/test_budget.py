@@ -0,0 +1,123 @@
+import pytest
+import threading
+from reglib.regex import Regex
+from reglib.dfa import Dfa
+from reglib.language import Language
+from reglib.budget import Budget, BudgetExceeded, Cancelled, CancellationToken
+
+def test_max_states():
+    regex = Regex("(a|b)*a" + "(a|b)" * 10)
+    with pytest.raises(BudgetExceeded) as exc_info:
+        with Budget(max_states=100):
+            Language.from_regex(regex).contains("ab")
+    assert exc_info.value.reason == "max_states"
+    assert exc_info.value.phase == "subset_construction"
+    assert exc_info.value.states == 101
+
+    with Budget(max_states=100, max_transitions=200, timeout=60):
+        lang = Language.from_regex(Regex("(a|b)*a(a|b)"))
+        assert lang.contains("bab")
+
+
+def test_product_budget():
+    langs = [
+        Language.from_regex(Regex(f"(a|b)*a{'(a|b)' * n}")) for n in range(4)
+    ]
+    for lang in langs:
+        lang._finalize()
+    with pytest.raises(BudgetExceeded) as exc_info:
+        with Budget(max_transitions=20):
+            Language.intersect_all(langs)
+    assert exc_info.value.reason == "max_transitions"
+    assert exc_info.value.phase == "product"
+
+
+def test_cancellation():
+    token = CancellationToken()
+    dfa = Dfa.from_regex(Regex("(a|b)*a(a|b)"))
+    with Budget(token=token):
+        dfa.minimize()
+        token.cancel()
+        with pytest.raises(Cancelled):
+            Dfa.from_regex(Regex("(a|b)*a(a|b)"))
+
+
+def test_budgets_per_thread():
+    # Both threads are inside their budget blocks at the same time, but the
+    # limits and cancellation of one must not apply to the other
+    regex = Regex("(a|b)*a(a|b)(a|b)")
+    token = CancellationToken()
+    cancelled = threading.Event()
+    finished = threading.Event()
+    results = dict()
+
+    def run_limited():
+        try:
+            with Budget(max_states=2, token=token):
+                token.cancel()
+                cancelled.set()
+                try:
+                    Dfa.from_regex(regex)
+                except Cancelled:
+                    results["limited"] = "cancelled"
+                finished.wait(timeout=10)
+        finally:
+            cancelled.set()
+
+    def run_unlimited():
+        cancelled.wait(timeout=10)
+        with Budget(max_states=100):
+            results["unlimited"] = Dfa.from_regex(regex).get_num_states()
+        finished.set()
+
+    threads = [
+        threading.Thread(target=run_limited),
+        threading.Thread(target=run_unlimited),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"limited": "cancelled", "unlimited": 9}
+
+
+def test_minimize_budget():
+    dfa = Dfa.from_regex(Regex("(a|b)*a(a|b)(a|b)(a|b)"))
+    with pytest.raises(BudgetExceeded) as exc_info:
+        with Budget(max_states=4):
+            dfa.minimize()
+    assert exc_info.value.phase == "minimize"
+    assert exc_info.value.reason == "max_states"
+    assert exc_info.value.transitions is None
+    assert str(exc_info.value) == (
+        f"minimize exceeded its budget (max_states) with "
+        f"{exc_info.value.states} states"
+    )
+
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(Cancelled) as exc_info:
+        with Budget(token=token):
+            dfa.minimize()
+    assert str(exc_info.value) == (
+        "minimize exceeded its budget (cancelled) with 2 states"
+    )
+    assert str(Cancelled("cancelled", "minimize")) == (
+        "minimize exceeded its budget (cancelled)"
+    )
+
+
+def test_to_regex_budget():
+    # The reversed language has an exponentially larger DFA, whose
+    # construction is cut off by to_regex itself
+    lang = Language.from_regex(Regex("(a|b)" * 9 + "a(a|b)*"))
+    with Budget(max_states=1000):
+        regex = lang.to_regex()
+    assert lang.is_equal_to(Language.from_regex(Regex(str(regex))))
+
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(Cancelled) as exc_info:
+        with Budget(token=token) as budget:
+            lang.to_regex()
+    assert exc_info.value.budget is budget
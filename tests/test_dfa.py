@@ -1,5 +1,7 @@
 from reglib.nfa import Nfa, EPS
 from reglib.dfa import Dfa
+from reglib import dfa as dfa_module
+from reglib.regex import Regex
 
 def test_from_nfa_0():
     nfa = Nfa()
@@ -158,3 +160,135 @@ def test_from_nfa_and_minimize():
     assert to(q26,  '0') == q26
     assert to(q26,  '1') == q26
     assert set(dfa.get_accepting_states()) == {q26}
+
+
+def test_symbol_classes():
+    dfa = Dfa()
+    dfa.get_new_states(3)
+    dfa.set_initial_state(0)
+    dfa.set_accepting_states(1)
+    to = dfa.set_transition
+    for q in range(3):
+        for digit in "0123456789":
+            to(q, digit, 1 if q < 2 else 2)
+        for letter in "abc":
+            to(q, letter, 2)
+
+    classes = dfa.get_symbol_classes()
+    assert len(classes) == 2
+    assert set("0123456789") in classes
+    assert set("abc") in classes
+
+    dfa.minimize()
+    assert dfa.get_num_states() == 3
+    q0 = dfa.get_initial_state()
+    to = dfa.get_transition
+    q1 = to(q0, '7')
+    assert to(q1, '3') == q1
+    assert to(q0, 'b') == to(q1, 'a')
+    assert dfa.get_accepting_states() == {q1}
+
+
+def test_from_words():
+    words = ["tap", "taps", "top", "tops", "stop", "stops", "tap", ""]
+    dfa = Dfa.from_words(words)
+    assert dfa.get_num_states() == 8
+    q0 = dfa.get_initial_state()
+    to = dfa.get_transition
+    q1 = to(q0, 't')
+    assert to(q1, 'a') == to(q1, 'o')
+    q2 = to(q1, 'a')
+    assert to(to(to(q0, 's'), 't'), 'o') == q2
+    q3 = to(q2, 'p')
+    q4 = to(q3, 's')
+    assert dfa.get_accepting_states() == {q0, q3, q4}
+
+    sorted_dfa = Dfa.from_words(sorted(set(words)))
+    assert sorted_dfa.get_num_states() == dfa.get_num_states()
+
+
+def test_minimize_unreachable_accepting_state():
+    dfa = Dfa()
+    dfa.get_new_states(3)
+    dfa.set_initial_state(0)
+    dfa.set_accepting_states(1, 2)
+    to = dfa.set_transition
+    to(0, '0', 1)
+    to(1, '0', 0)
+    to(2, '0', 2)
+
+    dfa.minimize()
+    assert dfa.get_num_states() == 2
+    q0 = dfa.get_initial_state()
+    q1 = dfa.get_transition(q0, '0')
+    assert dfa.get_accepting_states() == {q1}
+
+
+def test_from_nfa_parallel():
+    regex = Regex("(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)")
+    dfa = Dfa.from_regex(regex)
+    parallel_dfa = Dfa.from_regex(regex, processes=2)
+    assert parallel_dfa.get_num_states() == dfa.get_num_states()
+    assert parallel_dfa.canonical_form() == dfa.canonical_form()
+
+    # The pool of the first call is reused
+    pool = dfa_module._pools[2]
+    parallel_dfa = Dfa.from_regex(regex, processes=2)
+    assert dfa_module._pools[2] is pool
+    assert parallel_dfa.canonical_form() == dfa.canonical_form()
+
+
+def test_minimize_incremental():
+    dfa = Dfa.from_words(["ab", "ad", "cb"])
+    to = dfa.get_transition
+    q0 = dfa.get_initial_state()
+    assert to(q0, 'a') != to(q0, 'c')
+
+    # Accept "cd" too, so that "a" and "c" become equivalent
+    q_c = to(q0, 'c')
+    dfa.set_transition(q_c, 'd', to(q_c, 'b'))
+    assert dfa._dirty_states == {q_c}
+    dfa._finalize()
+    assert dfa._get_incremental_partition(None) is not None
+    dfa.minimize()
+    expected = Dfa.from_words(["ab", "ad", "cb", "cd"])
+    assert dfa.get_num_states() == expected.get_num_states()
+    assert dfa.canonical_form() == expected.canonical_form()
+    q0 = dfa.get_initial_state()
+    assert to(q0, 'a') == to(q0, 'c')
+
+    # Accept the empty string too
+    dfa.set_accepting_states(q0)
+    dfa.minimize()
+    expected = Dfa.from_words(["", "ab", "ad", "cb", "cd"])
+    assert dfa.canonical_form() == expected.canonical_form()
+    assert dfa._minimized and dfa._dirty_states == set()
+
+
+def test_minimize_incremental_merged_candidate():
+    dfa = Dfa()
+    dfa.get_new_states(5)
+    dfa.set_initial_state(0)
+    dfa.set_accepting_states(4)
+    to = dfa.set_transition
+    to(0, 'a', 1)
+    to(0, 'b', 1)
+    to(1, 'a', 2)
+    to(1, 'b', 1)
+    to(2, 'a', 4)
+    to(2, 'b', 3)
+    to(3, 'a', 3)
+    to(3, 'b', 3)
+    to(4, 'a', 3)
+    to(4, 'b', 3)
+    dfa.minimize()
+    assert dfa.get_num_states() == 5
+
+    # The language becomes empty, so every state is merged with the dead
+    # state, some of them only through states merged in an earlier round
+    q1 = dfa.get_transition(dfa.get_initial_state(), 'a')
+    q2 = dfa.get_transition(q1, 'a')
+    to(q2, 'a', q2)
+    dfa.minimize()
+    assert dfa.get_num_states() == 1
+    assert dfa.get_accepting_states() == set()
@@ -1,3 +1,5 @@
+import random
+import pytest
 from reglib.regex import Regex
 from reglib.dfa import Dfa
 from reglib.language import Language
@@ -98,3 +100,164 @@ def test_language_relations():
     lang_no_ab = Language.from_regex(Regex("(a*c|b)*a*"))
     lang_no_ab_equiv = Language.from_regex(Regex("b*(cb*|a)*"))
     assert lang_no_ab.is_equal_to(lang_no_ab_equiv)
+
+
+def test_language_intersect_all():
+    langs = [build_lang_multiple_of(x) for x in (2, 3, 5, 7)]
+    lang210 = Language.intersect_all(langs)
+    assert lang210.contains(bin(210 * 9173)[2:])
+    assert not lang210.contains(bin(105 * 9173)[2:])
+    assert lang210.is_equal_to(build_lang_multiple_of(210))
+
+    lang_a = Language.from_regex(Regex("a*"))
+    lang_b = Language.from_regex(Regex("b*"))
+    lang_a_and_b = Language.intersect_all([lang_a, lang_b])
+    assert lang_a_and_b.contains("")
+    assert not lang_a_and_b.contains("ab")
+
+
+def test_language_union_all_and_combine():
+    lang3, lang5, lang7 = [build_lang_multiple_of(x) for x in (3, 5, 7)]
+    lang3_or_5_or_7 = Language.union_all([lang3, lang5, lang7])
+    assert lang3_or_5_or_7.contains(bin(7 * 1201)[2:])
+    assert not lang3_or_5_or_7.contains(bin(11 * 13)[2:])
+    assert lang3_or_5_or_7.is_equal_to(lang3.union(lang5).union(lang7))
+
+    lang3_xor_5 = Language.combine([lang3, lang5], lambda x: x[0] != x[1])
+    assert lang3_xor_5.contains(bin(9)[2:])
+    assert lang3_xor_5.contains(bin(10)[2:])
+    assert not lang3_xor_5.contains(bin(15)[2:])
+    assert not lang3_xor_5.contains(bin(7)[2:])
+
+
+def test_language_combine_collapsed():
+    # Both components become fixed after one symbol, so the product collapses
+    # to a single accepting or rejecting state
+    lang_all = Language.from_regex(Regex("(a|b)*"))
+    lang_b = Language.from_regex(Regex("b(a|b)*"))
+    lang_xor = Language.combine([lang_all, lang_b], lambda x: x[0] != x[1])
+    assert lang_xor.contains("")
+    assert lang_xor.contains("a")
+    assert lang_xor.contains("abba")
+    assert not lang_xor.contains("b")
+    assert not lang_xor.contains("bab")
+
+
+def test_language_contains_other_alphabet():
+    lang_a_star = Language.from_regex(Regex("a*"))
+    lang_no_ab = Language.from_regex(Regex("(a*c|b)*a*"))
+    assert not lang_a_star.contains(lang_no_ab)
+    assert lang_no_ab.contains(lang_a_star)
+    assert not lang_a_star.is_equal_to(lang_no_ab)
+
+
+def test_language_compile():
+    lang = Language.from_regex(Regex("(a|b)*a(a|b)c?"))
+    match = lang.compile()
+    assert lang.compile() is match
+    assert match("bbaab")
+    assert match("aabc")
+    assert not match("bac")
+    assert not match("aacb")
+    assert not match("aad")
+    assert not match("")
+    assert lang.contains("bbabc")
+
+    assert not Language.from_regex(Regex("∅")).compile()("")
+
+
+def test_language_count_and_strings():
+    lang = Language.from_regex(Regex("(a|b)*a(a|b)"))
+    assert [lang.count(n) for n in range(5)] == [0, 0, 2, 4, 8]
+    assert lang.count(200) == 2 ** 199
+    assert lang.count(20000) == 2 ** 19999
+    assert lang._counts is None
+
+    lang7 = build_lang_multiple_of(7)
+    lang7._get_counts(300)
+    counts7 = Language.from_nfa(lang7._nfa)
+    for n in (0, 1, 2, 3, 50, 64, 299):
+        assert counts7.count(n) == lang7.count(n)
+    assert list(lang.strings(3)) == [
+        "aa", "ab", "aaa", "aab", "baa", "bab"
+    ]
+
+    lang_finite = Language.from_words(["ba", "a", "ab", "bab"])
+    assert list(lang_finite.strings()) == ["a", "ab", "ba", "bab"]
+    assert list(Language.from_regex(Regex("∅")).strings()) == []
+
+
+def test_language_sample():
+    lang = Language.from_regex(Regex("(a|b)*a(a|b)"))
+    rng = random.Random(0)
+    samples = [lang.sample(6, rng) for _ in range(1000)]
+    assert all(len(x) == 6 and lang.contains(x) for x in samples)
+    assert len(set(samples)) == lang.count(6)
+    assert lang.sample(1, rng) is None
+
+
+def test_language_fingerprint():
+    lang_no_ab = Language.from_regex(Regex("(a*c|b)*a*"))
+    lang_no_ab_equiv = Language.from_regex(Regex("b*(cb*|a)*"))
+    lang_a_star = Language.from_regex(Regex("a*"))
+    lang_a_star_equiv = Language.from_regex(Regex("(a|b∅)*"))
+    assert lang_no_ab.fingerprint() == lang_no_ab_equiv.fingerprint()
+    assert lang_a_star.fingerprint() == lang_a_star_equiv.fingerprint()
+    assert lang_no_ab.fingerprint() != lang_a_star.fingerprint()
+
+    langs = [
+        lang_no_ab, lang_a_star, lang_no_ab_equiv,
+        Language.from_words(["a", "ab"]), lang_a_star_equiv,
+        Language.from_regex(Regex("ab?")),
+    ]
+    groups = Language.group_equivalent(langs)
+    assert groups == [
+        [langs[0], langs[2]], [langs[1], langs[4]], [langs[3], langs[5]]
+    ]
+
+
+def test_language_to_regex():
+    for string in [
+        "(0|(1(01*0)*1))*", "(a*c|b)*a*", "ab(a|c|b+c)*b+a", "a?b+", "ε", "∅",
+        "0+|(1|0+1)(11|10+1|01*0)*10+",
+        "?a|b(?)+",
+    ]:
+        lang = Language.from_regex(Regex(string))
+        regex = lang.to_regex()
+        assert lang.is_equal_to(Language.from_regex(regex))
+        assert lang.is_equal_to(Language.from_regex(Regex(str(regex))))
+
+    assert str(Language.from_regex(Regex("(ab)*a")).to_regex()) == "a(ba)*"
+    assert str(Language.from_words(["ab", "ac"]).to_regex()) == "a(b|c)"
+
+
+def test_language_to_regex_size():
+    # The minimal DFA has 2^10 states, but the one of the reversed language
+    # only has 12
+    lang = Language.from_regex(Regex("(a|b)*a" + "(a|b)" * 9))
+    assert str(lang.to_regex()) == "(a|b)*a" + "(a|b)" * 9
+
+    rng = random.Random(0)
+    dfa = Dfa()
+    dfa.get_new_states(60)
+    dfa.set_initial_state(0)
+    dfa.set_accepting_states(*[p for p in range(60) if rng.random() < 0.5])
+    for p in range(60):
+        for symbol in "ab":
+            dfa.set_transition(p, symbol, rng.randrange(60))
+    with pytest.raises(ValueError):
+        Language.from_nfa(dfa).to_regex(max_length=10000)
+
+
+def test_language_to_regex_unwritable_symbol():
+    dfa = Dfa()
+    dfa.get_new_states(2)
+    dfa.set_initial_state(0)
+    dfa.set_accepting_states(1)
+    dfa.set_transition(0, "ε", 1)
+    dfa.set_transition(1, "a", 1)
+    regex = Language.from_nfa(dfa).to_regex()
+    assert Language.from_regex(regex).contains("εaa")
+    assert not Language.from_regex(regex).contains("a")
+    with pytest.raises(ValueError):
+        str(regex)
@@ -0,0 +1,49 @@
+import io
+from reglib.nfa import Nfa, EPS
+from reglib.regex import Regex
+
+def test_to_dot():
+    nfa = Nfa()
+    q0, q1, q2 = nfa.get_new_states(3)
+    nfa.set_initial_state(q0)
+    nfa.set_accepting_states(q2)
+    to = nfa.set_transition
+    for symbol in "abcdxz":
+        to(q0, symbol, q1)
+    to(q0, EPS, q1)
+    to(q1, '"', q2)
+
+    f = io.StringIO()
+    nfa.to_dot(f)
+    lines = f.getvalue().splitlines()
+    assert lines[0] == "digraph {"
+    assert lines[-1] == "}"
+    assert "  2 [shape=doublecircle];" in lines
+    assert '  0 -> 1 [label="ε, a-d, x, z"];' in lines
+    assert '  1 -> 2 [label="\\""];' in lines
+
+
+def test_to_dot_truncated():
+    nfa = Regex("abcdefgh").to_nfa()
+    f = io.StringIO()
+    nfa.to_dot(f, max_states=4)
+    dot = f.getvalue()
+    assert "truncated" in dot
+    assert dot.count("->") == 4
+
+
+def test_to_dot_non_str_symbols_and_unreachable_states():
+    nfa = Nfa()
+    q0, q1, q2 = nfa.get_new_states(3)
+    nfa.set_initial_state(q0)
+    nfa.set_accepting_states(q1)
+    nfa.set_transition(q0, 1, q1)
+    nfa.set_transition(q0, 2, q1)
+    nfa.set_transition(q2, 3, q0)
+
+    # q2 is unreachable, so the first two states are all that can be written
+    f = io.StringIO()
+    nfa.to_dot(f, max_states=2)
+    lines = f.getvalue().splitlines()
+    assert '  0 -> 1 [label="1, 2"];' in lines
+    assert not any("truncated" in line for line in lines)
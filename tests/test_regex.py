@@ -99,3 +99,19 @@ def test_regex_4():
     assert to(q3, '0') == q3
     assert to(q3, '1') == q3
     assert dfa.get_accepting_states() == {q0, q1, q2}
+
+
+def test_regex_bit_parallel():
+    match = Regex("(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)"
+                  "(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)"
+                  ).to_bit_parallel()
+    assert match("b" * 100 + "a" + "b" * 19)
+    assert match("ab" * 100 + "a" * 20)
+    assert not match("b" * 100 + "a" + "b" * 18)
+    assert not match("b" * 120)
+    assert not match("c" + "a" * 20)
+
+    match = Regex("0?(1|ε)").to_bit_parallel()
+    assert match("") and match("0") and match("1") and match("01")
+    assert not match("10") and not match("00")
+    assert not Regex("a∅").to_bit_parallel()("a")
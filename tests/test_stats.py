@@ -0,0 +1,87 @@
+from reglib.regex import Regex
+from reglib.language import Language
+from reglib import stats
+import threading
+
+def test_collect_stats():
+    with stats.collect_stats() as collected:
+        lang = Language.from_regex(Regex("(a|b)*a(a|b)(a|b)"))
+        assert lang.contains("baab")
+    phases = collected.as_dict()
+    for phase in (
+        "parse", "thompson", "eps_closure", "subset_construction", "minimize"
+    ):
+        assert phases[phase]["calls"] >= 1
+        assert phases[phase]["seconds"] >= 0
+    assert phases["subset_construction"]["states"] == 9
+    assert phases["subset_construction"]["peak_subset_size"] > 1
+    assert phases["minimize"]["states"] == 8
+    # Transitions are counted per symbol in every phase
+    assert phases["subset_construction"]["transitions"] == 9 * 2
+    assert phases["minimize"]["transitions"] == 8 * 2
+
+    with stats.collect_stats() as collected:
+        lang.to_regex()
+    # The states of the minimal DFA of the reversed language (a|b)(a|b)a(a|b)*
+    # are eliminated, leaving out the state that can never accept
+    phases = collected.as_dict()
+    assert phases["state_elimination"]["states"] == 4
+    assert phases["state_elimination"]["transitions"] == 2 + 2 + 1 + 2
+
+    with stats.collect_stats() as collected:
+        pass
+    lang = Language.from_regex(Regex("ab*"))
+    assert lang.contains("abb")
+    assert collected.as_dict() == dict()
+
+
+def test_hook():
+    reported = []
+    stats.add_hook(reported.append)
+    try:
+        Regex("a|b").to_nfa()
+    finally:
+        stats.remove_hook(reported.append)
+    Regex("a|b").to_nfa()
+
+    phases = [phase_stats.phase for phase_stats in reported]
+    assert phases.count("parse") == 1
+    assert phases.count("thompson") == 1
+    assert reported[-1].as_dict()["states"] == 5
+
+
+def test_collect_stats_per_thread():
+    # The other thread runs its query while the block below is active, but
+    # its phases must not be collected by the block
+    started = threading.Event()
+    finished = threading.Event()
+
+    def run_other_query():
+        started.wait(timeout=10)
+        Language.from_regex(Regex("(a|b)*a(a|b)")).contains("ab")
+        finished.set()
+
+    thread = threading.Thread(target=run_other_query)
+    thread.start()
+    with stats.collect_stats() as collected:
+        started.set()
+        finished.wait(timeout=10)
+        Regex("a|b").to_nfa()
+    thread.join()
+    phases = collected.as_dict()
+    assert set(phases) == {"parse", "thompson"}
+    assert phases["parse"]["calls"] == 1
+
+
+def test_hook_other_thread():
+    # Hooks installed once (e.g. to export metrics) see all threads
+    reported = []
+    stats.add_hook(reported.append)
+    try:
+        thread = threading.Thread(target=lambda: Regex("a|b").to_nfa())
+        thread.start()
+        thread.join()
+    finally:
+        stats.remove_hook(reported.append)
+    phases = [phase_stats.phase for phase_stats in reported]
+    assert phases == ["parse", "thompson"]